@@ -1,42 +1,99 @@
-import requests
+import asyncio
+import importlib
+import importlib.util
+import codecs
 import os
 import time
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 from selectolax.parser import HTMLParser
 from urllib.parse import quote_plus
 from collections import deque
 import socket
-from openai import OpenAI
 from dotenv import load_dotenv
 import json
 import subprocess
+import selectors
+import signal
+import sys
 import datetime
-import schedule
+import heapq
+import math
+import itertools
 import threading
-import google.generativeai as genai
-from voice import listen, speak
-from markdownify import markdownify as md
 import hashlib
-
-from langchain.text_splitter import MarkdownHeaderTextSplitter
-from langchain_cohere import CohereEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from langchain import hub
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from langchain_google_genai import ChatGoogleGenerativeAI
+import sqlite3
 import shutil
+from types import SimpleNamespace
+from urllib.parse import urljoin
+
+# Set GAURIKA_IMPORT_REPORT=1 to print how long each lazily imported module takes to load,
+# and how long each connection takes to warm up at startup
+import_report = os.getenv("GAURIKA_IMPORT_REPORT") == "1"
+
+class LazyModule:
+    """Imports a module, or one attribute of it, the first time it is used.
+
+    The heavy client libraries below are only needed once a chat, WebTool or voice
+    call actually happens, so importing them up front would slow every startup.
+    """
+
+    def __init__(self, name, attribute=None):
+        self._name = name
+        self._attribute = attribute
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    start = time.perf_counter()
+                    target = importlib.import_module(self._name)
+                    if self._attribute:
+                        target = getattr(target, self._attribute)
+                    if import_report:
+                        label = f"{self._name}.{self._attribute}" if self._attribute else self._name
+                        print(f"[import] {label}: {time.perf_counter() - start:.3f}s")
+                    self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+httpx = LazyModule("httpx")
+np = LazyModule("numpy")
+voice = LazyModule("voice")
+genai = LazyModule("google.generativeai")
+OpenAI = LazyModule("openai", "OpenAI")
+DefaultHttpxClient = LazyModule("openai", "DefaultHttpxClient")
+MarkdownHeaderTextSplitter = LazyModule("langchain.text_splitter", "MarkdownHeaderTextSplitter")
+CohereEmbeddings = LazyModule("langchain_cohere", "CohereEmbeddings")
+Embeddings = LazyModule("langchain_core.embeddings", "Embeddings")
+Document = LazyModule("langchain_core.documents", "Document")
+FAISS = LazyModule("langchain_community.vectorstores", "FAISS")
+create_stuff_documents_chain = LazyModule("langchain.chains.combine_documents", "create_stuff_documents_chain")
+ChatPromptTemplate = LazyModule("langchain_core.prompts", "ChatPromptTemplate")
+MessagesPlaceholder = LazyModule("langchain_core.prompts", "MessagesPlaceholder")
+ChatGoogleGenerativeAI = LazyModule("langchain_google_genai", "ChatGoogleGenerativeAI")
+
 # Load environment variables from .env file
 load_dotenv()
 Cre = os.getenv("CRE_API_KEY")
 Cre_base_url = "https://api.cerebras.ai/v1"
-genai.configure(api_key=os.getenv('GEM'))
 cohere_key = os.getenv("COHERE_API_KEY")
 cse_api_key = os.getenv('CSE_API_KEY')
 search_engine_id = os.getenv('SEARCH_ENGINE_ID')
+embedding_model = "embed-english-v3.0"
+# Set WEBTOOL_SAVE_MARKDOWN=1 to keep each scraped page as markdown/<md5 of url>.md for debugging
+webtool_save_markdown = os.getenv("WEBTOOL_SAVE_MARKDOWN") == "1"
+# Seconds WebTool waits for pages before answering with whatever has arrived
+webtool_fetch_budget = 2.5
 
 # Set a global socket timeout
 socket.setdefaulttimeout(1)
@@ -96,6 +153,25 @@ tools = [
                     "interval": {
                         "type": "integer",
                         "description": "The interval in seconds between each execution of the task.",
+                    },
+                    "overlap": {
+                        "type": "string",
+                        "enum": ["skip", "queue"],
+                        "description": "What to do when a run is due while the previous one is still going: 'skip' it (default) or 'queue' it.",
+                    },
+                    "catch_up": {
+                        "type": "string",
+                        "enum": ["once", "skip"],
+                        "description": "What to do about runs missed while the assistant was not running: run 'once' at startup (default) or 'skip' them.",
+                    },
+                    "notify": {
+                        "type": "string",
+                        "enum": ["change", "always", "above", "below"],
+                        "description": "When to show a result: when the output 'change's (default), 'always', or when the first number in the output goes 'above' or 'below' the threshold.",
+                    },
+                    "threshold": {
+                        "type": "number",
+                        "description": "The threshold for the 'above' and 'below' notify modes.",
                     }
                 },
                 "required": ["task_name", "command", "interval"],
@@ -118,11 +194,62 @@ tools = [
                 "required": ["task_name"],
             },
         },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_system_metrics",
+            "description": "Get live system metrics: load average, memory, disk usage of / and the top processes by memory and CPU time.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_task_results",
+            "description": "Get the recent results of scheduled tasks without running them again.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_name": {
+                        "type": "string",
+                        "description": "The task to show results for. Leave out to get the latest result of every task.",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "How many recent results to return (default 5).",
+                    }
+                },
+            },
+        },
     }
 ]
 
-# Initialize OpenAI client
-client = OpenAI(api_key=Cre, base_url=Cre_base_url)
+# Keep-alive pool shared by the LLM client and the fetch engine. The expiry is long enough
+# that connections opened by the startup warm-up are still there for the first turn.
+# Overridable through the "connection_pool" entry in user_pref.json.
+connection_pool = {"max_connections": 20, "max_keepalive": 10, "keepalive_expiry": 120}
+
+# OpenAI client, constructed on first use. The lock makes the startup warm-up and the
+# first chat() share one client, so the connection opened by the warm-up gets used.
+client = None
+client_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        with client_lock:
+            if client is None:
+                limits = httpx.Limits(
+                    max_connections=connection_pool["max_connections"],
+                    max_keepalive_connections=connection_pool["max_keepalive"],
+                    keepalive_expiry=connection_pool["keepalive_expiry"],
+                )
+                client = OpenAI(api_key=Cre, base_url=Cre_base_url, http_client=DefaultHttpxClient(limits=limits))
+    return client
 
 # Global variables
 context_history = []
@@ -140,50 +267,513 @@ class bcolors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-def load_context_history(filename="context_history.json"):
-    try:
-        with open(filename, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
+# Conversation journal: one JSON message per line, only ever appended to between compactions
+# written counts the messages of context_history already in the journal, and messages
+# counts the lines in the journal file, including any that were never loaded
+journal_state = {"written": 0, "messages": 0}
+
+def read_journal_head(f):
+    """Reads the leading system messages and returns them with the offset just after them."""
+    head = []
+    offset = 0
+    f.seek(0)
+    for line in f:
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            break
+        if message.get("role") != "system":
+            break
+        head.append(message)
+        offset += len(line)
+    return head, offset
+
+def read_journal_tail(f, max_messages, start, block_size=64 * 1024):
+    """Reads the last max_messages lines after offset start, scanning backwards from the end."""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    data = b""
+    while position > start and data.count(b"\n") <= max_messages:
+        read_size = min(block_size, position - start)
+        position -= read_size
+        f.seek(position)
+        data = f.read(read_size) + data
+    lines = data.split(b"\n")
+    if position > start:
+        # The first line is only partially read
+        lines = lines[1:]
+    return [line for line in lines if line.strip()][-max_messages:]
+
+def load_context_history(filename="context_history.jsonl", max_messages=None, legacy_filename="context_history.json"):
+    """Loads the conversation journal.
+
+    With max_messages set, only the pinned system messages at the start of the journal and
+    the last max_messages messages are read. A line torn by a crash mid-write is dropped.
+    """
+    if not os.path.exists(filename):
+        if os.path.exists(legacy_filename):
+            with open(legacy_filename, "r") as f:
+                history = json.load(f)
+            write_journal_snapshot(history, filename)
+            journal_state.update(written=len(history), messages=len(history))
+            return history
+        journal_state.update(written=0, messages=0)
         return []
 
-def save_context_history(context_history, filename="context_history.json"):
-    with open(filename, "w") as f:
-        json.dump(context_history, f, indent=2)
+    with open(filename, "rb+") as f:
+        # Drop a torn final line so the next append starts on a fresh line
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.seek(0)
+                content = f.read()
+                f.truncate(content.rfind(b"\n") + 1)
+
+        head, head_end = read_journal_head(f)
+        if max_messages is None:
+            f.seek(head_end)
+            lines = f.read().split(b"\n")
+            message_count = len(head) + sum(1 for line in lines if line.strip())
+        else:
+            lines = read_journal_tail(f, max_messages, head_end)
+            f.seek(head_end)
+            message_count = len(head) + sum(block.count(b"\n") for block in iter(lambda: f.read(1024 * 1024), b""))
 
-def execute_linux_command(command, trust_mode):
-    """Executes a Linux command based on the trust mode."""
-    if trust_mode == "full":
+    history = head
+    for line in lines:
+        if line.strip():
+            try:
+                history.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    journal_state.update(written=len(history), messages=message_count)
+    return history
+
+def write_journal_snapshot(messages, filename="context_history.jsonl"):
+    """Atomically replaces the journal with messages."""
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "w") as f:
+        for message in messages:
+            f.write(json.dumps(message) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, filename)
+
+def save_context_history(context_history, filename="context_history.jsonl", compact_bytes=8 * 1024 * 1024, keep=1000):
+    """Appends messages not yet in the journal, compacting it once it grows past compact_bytes.
+
+    Compaction rebuilds the journal from the file itself, keeping the pinned system messages
+    and the last keep messages, so messages that were never loaded into context_history are
+    not lost. It only runs once the journal holds twice keep messages, so every rewrite is
+    paid for by at least keep appends. context_history is trimmed the same way, and the
+    snapshot is written atomically.
+    """
+    new_messages = context_history[journal_state["written"]:]
+    if new_messages:
+        with open(filename, "a") as f:
+            f.write("".join(json.dumps(message) + "\n" for message in new_messages))
+            f.flush()
+            os.fsync(f.fileno())
+        journal_state["written"] = len(context_history)
+        journal_state["messages"] += len(new_messages)
+
+    if journal_state["messages"] <= 2 * keep or os.path.getsize(filename) <= compact_bytes:
+        return
+    with open(filename, "rb") as f:
+        messages, head_end = read_journal_head(f)
+        for line in read_journal_tail(f, keep, head_end):
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    write_journal_snapshot(messages, filename)
+    journal_state["messages"] = len(messages)
+
+    pinned = 0
+    while pinned < len(context_history) and context_history[pinned]["role"] == "system":
+        pinned += 1
+    context_history[:] = context_history[:pinned] + context_history[pinned:][-keep:]
+    journal_state["written"] = len(context_history)
+
+# Context window management
+def estimate_tokens(message):
+    """Roughly estimates a message's token count at four characters per token."""
+    text = message.get("content") or ""
+    for tool_call in message.get("tool_calls") or []:
+        text += json.dumps(tool_call) if isinstance(tool_call, dict) else str(tool_call)
+    return len(text) // 4 + 4
+
+def truncate_text(text, max_tokens):
+    """Keeps the head and tail of text within max_tokens, marking what was cut out."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return f"{text[:head]}\n[... {len(text) - max_chars} characters omitted ...]\n{text[-tail:]}"
+
+def summarize_turns(turns, max_tokens=300):
+    """Builds a short note listing what the user asked in turns that were dropped from the context."""
+    requests = [
+        truncate_text(message["content"] or "", 30).replace("\n", " ")
+        for turn in turns for message in turn if message["role"] == "user"
+    ]
+    summary = "Earlier conversation was compacted to fit the context window. The user had previously asked:"
+    # Prefer the most recent requests if they do not all fit
+    kept = []
+    for request in reversed(requests):
+        if estimate_tokens({"content": summary + "".join(kept) + request}) > max_tokens:
+            break
+        kept.insert(0, f"\n- {request}")
+    return {"role": "system", "content": summary + "".join(kept)}
+
+def compact_context(messages, budget=8000, tool_output_limit=1000, summary_limit=300, extra_pinned=()):
+    """Returns a copy of messages that fits within roughly budget tokens.
+
+    Leading system messages stay pinned, followed by extra_pinned, which holds messages
+    built fresh for each call rather than stored in the history. Tool outputs from earlier
+    turns are cut down to tool_output_limit tokens, and so are the latest turn's if the
+    history is still over budget. Only then are whole turns (a user message and everything
+    after it) dropped oldest first and replaced by a short summary. The latest turn is
+    always kept.
+    """
+    pinned = []
+    for message in messages:
+        if message["role"] != "system":
+            break
+        pinned.append(message)
+    history_start = len(pinned)
+    pinned += [message for message in extra_pinned if message]
+
+    turns = []
+    for message in messages[history_start:]:
+        if message["role"] == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+
+    def shrink_tool_outputs(turn, limit):
+        return [
+            {**message, "content": truncate_text(message["content"] or "", limit)} if message["role"] == "tool" else message
+            for message in turn
+        ]
+
+    turns = [shrink_tool_outputs(turn, tool_output_limit) for turn in turns[:-1]] + turns[-1:]
+    turn_tokens = [sum(estimate_tokens(message) for message in turn) for turn in turns]
+    used = sum(estimate_tokens(message) for message in pinned) + sum(turn_tokens)
+
+    # Shrinking the latest turn's tool outputs costs less than dropping history, so try it first
+    if turns and used > budget:
+        turns[-1] = shrink_tool_outputs(turns[-1], tool_output_limit)
+        used -= turn_tokens[-1]
+        turn_tokens[-1] = sum(estimate_tokens(message) for message in turns[-1])
+        used += turn_tokens[-1]
+
+    dropped = []
+    while len(turns) > 1 and used > budget:
+        dropped.append(turns.pop(0))
+        used -= turn_tokens.pop(0)
+        if len(dropped) == 1:
+            used += summary_limit
+
+    summary = [summarize_turns(dropped, summary_limit)] if dropped else []
+    return pinned + summary + [message for turn in turns for message in turn]
+
+def descendant_pids(pid):
+    """Returns the pids of every process descended from pid, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = read_proc_file(f"/proc/{entry}/stat")
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 1 and fields[1].isdigit():
+            children.setdefault(int(fields[1]), []).append(int(entry))
+    descendants = []
+    pending = [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            descendants.append(child)
+            pending.append(child)
+    return descendants
+
+def stop_command(process, detached):
+    """Terminates a command and everything it started, killing it if it ignores SIGTERM.
+
+    Processes that may not be signalled, such as children of sudo running as root, are
+    skipped; the shell itself always belongs to the user and is still stopped.
+    """
+    def send(sig):
+        if detached:
+            # The command runs in its own session, so its process group holds everything it started
+            os.killpg(process.pid, sig)
+            return
+        for pid in [process.pid] + descendant_pids(process.pid):
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+
+    try:
+        send(signal.SIGTERM)
+        process.wait(timeout=2)
+    except subprocess.TimeoutExpired:
         try:
-            output = subprocess.check_output(command, shell=True, text=True, stderr=subprocess.STDOUT)
-            return output
-        except subprocess.CalledProcessError as e:
-            return f"Command '{command}' failed with error:\n{e.output}"
+            send(signal.SIGKILL)
+        except OSError:
+            pass
+    except OSError:
+        pass
+
+# Seconds a command the user is watching may run before it is stopped. Installs and upgrades
+# regularly take minutes, and stopping one mid-transaction is worse than waiting. Set from
+# "live_command_timeout" in user_pref.json, where null means no limit.
+live_command_timeout = 1800
+
+def run_command(command, timeout=60, output_limit=16 * 1024, max_bytes=10 * 1024 * 1024, live=True):
+    """Runs a shell command, optionally streaming its output to the terminal as it arrives.
+
+    The command is stopped once it runs for timeout seconds (never if timeout is None) or
+    prints more than max_bytes.
+    Only the first and last output_limit / 2 bytes are kept, so a runaway command cannot
+    exhaust memory or the prompt. Returns (output, returncode, stop_reason), where
+    stop_reason is None, "timeout" or "output limit".
+
+    Live commands keep the terminal and stdin, so sudo can ask for a password and package
+    managers can ask for confirmation. Other commands run detached in their own session
+    with no stdin.
+    """
+    if live:
+        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    else:
+        process = subprocess.Popen(
+            command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, start_new_session=True,
+        )
+    half = output_limit // 2
+    head = bytearray()
+    tail = deque()
+    tail_size = 0
+    total = 0
+    stop_reason = None
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    fd = process.stdout.fileno()
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                stop_reason = "timeout"
+                break
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            total += len(chunk)
+            if live:
+                sys.stdout.write(decoder.decode(chunk))
+                sys.stdout.flush()
+
+            if len(head) < half:
+                taken = half - len(head)
+                head += chunk[:taken]
+                chunk = chunk[taken:]
+            if chunk:
+                tail.append(chunk)
+                tail_size += len(chunk)
+                while tail and tail_size - len(tail[0]) >= half:
+                    tail_size -= len(tail.popleft())
+
+            if total > max_bytes:
+                stop_reason = "output limit"
+                break
+
+    if stop_reason:
+        stop_command(process, detached=not live)
+    returncode = process.wait()
+    process.stdout.close()
+    if live:
+        sys.stdout.write(decoder.decode(b"", final=True))
+        sys.stdout.flush()
+
+    tail_bytes = b"".join(tail)[-half:] if half else b""
+    omitted = total - len(head) - len(tail_bytes)
+    output = head.decode("utf-8", errors="replace")
+    if omitted > 0:
+        output += f"\n[... {omitted} bytes of output omitted ...]\n"
+    output += tail_bytes.decode("utf-8", errors="replace")
+    return output, returncode, stop_reason
+
+def describe_command_result(command, output, returncode, stop_reason, timeout=60):
+    """Returns the text the model sees for a finished command, or None if it succeeded."""
+    if stop_reason == "timeout":
+        return f"Command '{command}' was stopped after running for {timeout} seconds. Output so far:\n{output}"
+    if stop_reason == "output limit":
+        return f"Command '{command}' was stopped because it produced too much output. Output so far:\n{output}"
+    if returncode != 0:
+        return f"Command '{command}' failed with error:\n{output}"
+    return None
+
+def execute_linux_command(command, trust_mode, live=True, timeout=None, confirmed=False):
+    """Executes a Linux command based on the trust mode.
+
+    With live set, output is streamed to the terminal while the command runs. confirmed
+    skips the half trust mode prompt when the user has already approved the command.
+    timeout defaults to live_command_timeout for live commands and 60 seconds otherwise.
+    """
+    if timeout is None:
+        timeout = live_command_timeout if live else 60
+    if trust_mode == "full":
+        output, returncode, stop_reason = run_command(command, timeout=timeout, live=live)
+        problem = describe_command_result(command, output, returncode, stop_reason, timeout)
+        return problem if problem else output
     elif trust_mode == "half":
-        user_input = input(f"\n{bcolors.WARNING}The assistant suggests running the following command:\n'{command}'\nDo you want to execute this command? (y/n): {bcolors.ENDC}").strip().lower()
+        user_input = "y" if confirmed else input(f"\n{bcolors.WARNING}The assistant suggests running the following command:\n'{command}'\nDo you want to execute this command? (y/n): {bcolors.ENDC}").strip().lower()
         if user_input == "y":
-            try:
-                output = subprocess.check_output(command, shell=True, text=True, stderr=subprocess.STDOUT)
-                return output + f"\n{bcolors.OKGREEN}Command '{command}' executed successfully.{bcolors.ENDC}"
-            except subprocess.CalledProcessError as e:
-                return f"{bcolors.FAIL}Command '{command}' failed with error:\n{e.output}{bcolors.ENDC}"
+            output, returncode, stop_reason = run_command(command, timeout=timeout, live=live)
+            problem = describe_command_result(command, output, returncode, stop_reason, timeout)
+            if problem:
+                return f"{bcolors.FAIL}{problem}{bcolors.ENDC}"
+            return output + f"\n{bcolors.OKGREEN}Command '{command}' executed successfully.{bcolors.ENDC}"
         else:
             return f"{bcolors.WARNING}Command execution disallowed by the user.{bcolors.ENDC}"
     else:  # trust_mode == "none"
         return f"{bcolors.WARNING}Command execution is disabled in this trust mode.{bcolors.ENDC}"
 
-def get_system_info():
-    """Retrieves basic system information."""
-    info = {}
-    info['OS'] = subprocess.check_output('uname -s', shell=True, text=True).strip()
-    info['Kernel'] = subprocess.check_output('uname -r', shell=True, text=True).strip()
-    info['CPU'] = subprocess.check_output('lscpu | grep "Model name" | cut -d ":" -f 2', shell=True, text=True).strip()
-    info['Memory'] = subprocess.check_output('free -h | awk \'/^Mem:/ {print $2}\'', shell=True, text=True).strip()
+def read_proc_file(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+def read_meminfo():
+    """Returns /proc/meminfo as a dict of sizes in bytes."""
+    meminfo = {}
+    for line in read_proc_file("/proc/meminfo").splitlines():
+        name, _, value = line.partition(":")
+        parts = value.split()
+        if parts and parts[0].isdigit():
+            meminfo[name] = int(parts[0]) * 1024
+    return meminfo
+
+def format_bytes(size):
+    """Formats a size the way `free -h` does, e.g. 15Gi or 7.6Gi."""
+    for unit in ["B", "Ki", "Mi", "Gi", "Ti"]:
+        if size < 1024 or unit == "Ti":
+            return f"{size:.1f}{unit}" if size < 10 and unit != "B" else f"{size:.0f}{unit}"
+        size /= 1024
+
+def read_cpu_model():
+    for line in read_proc_file("/proc/cpuinfo").splitlines():
+        name, _, value = line.partition(":")
+        # x86 reports "model name"; many ARM kernels only report "Hardware" or "Processor"
+        if name.strip() in ("model name", "Hardware", "Processor", "cpu model") and value.strip():
+            return value.strip()
+    return os.uname().machine
+
+def collect_system_info():
+    uname = os.uname()
+    return {
+        'OS': uname.sysname,
+        'Kernel': uname.release,
+        'CPU': read_cpu_model(),
+        'Memory': format_bytes(read_meminfo().get("MemTotal", 0)),
+    }
+
+system_info_cache = {"info": None, "time": 0.0, "refreshing": False}
+system_info_lock = threading.Lock()
+
+def refresh_system_info():
+    info = collect_system_info()
+    with system_info_lock:
+        system_info_cache.update(info=info, time=time.time(), refreshing=False)
+    return info
+
+def get_system_info(ttl=60):
+    """Retrieves basic system information from /proc and os.uname().
+
+    The result is cached for ttl seconds. Once it is stale the cached copy is still
+    returned while a background thread refreshes it.
+    """
+    with system_info_lock:
+        info = system_info_cache["info"]
+        stale = time.time() - system_info_cache["time"] > ttl
+        start_refresh = info is not None and stale and not system_info_cache["refreshing"]
+        if start_refresh:
+            system_info_cache["refreshing"] = True
+    if info is None:
+        info = refresh_system_info()
+    elif start_refresh:
+        threading.Thread(target=refresh_system_info, daemon=True).start()
     return json.dumps(info, indent=2)
 
-def chat(messages, model="llama3.1-70b", temperature=0.75, max_tokens=4096, tool_choice="auto"):
-    """Gets response from the AI model (no streaming)."""
-    response = client.chat.completions.create(
+def read_processes():
+    """Returns (pid, name, rss bytes, cpu seconds) for every readable process in /proc."""
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    processes = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = read_proc_file(f"/proc/{entry}/stat")
+        if not stat:
+            continue
+        # The command name is in parentheses and may itself contain spaces
+        name = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        try:
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / clock_ticks
+            rss = int(fields[21]) * page_size
+        except (IndexError, ValueError):
+            continue
+        processes.append((int(entry), name, rss, cpu_seconds))
+    return processes
+
+def get_system_metrics(top=5):
+    """Returns live load, memory, disk and top-process figures as JSON without spawning a shell."""
+    meminfo = read_meminfo()
+    disk = shutil.disk_usage("/")
+    uptime = read_proc_file("/proc/uptime").split()
+    processes = read_processes()
+
+    metrics = {
+        "Load average (1, 5, 15 min)": [round(load, 2) for load in os.getloadavg()],
+        "CPUs": os.cpu_count(),
+        "Uptime": str(datetime.timedelta(seconds=int(float(uptime[0])))) if uptime else "unknown",
+        "Memory": {
+            "total": format_bytes(meminfo.get("MemTotal", 0)),
+            "available": format_bytes(meminfo.get("MemAvailable", 0)),
+            "swap used": format_bytes(meminfo.get("SwapTotal", 0) - meminfo.get("SwapFree", 0)),
+        },
+        "Disk (/)": {
+            "total": format_bytes(disk.total),
+            "used": format_bytes(disk.used),
+            "free": format_bytes(disk.free),
+            "used %": round(disk.used / disk.total * 100, 1) if disk.total else 0,
+        },
+        "Top processes by memory": [
+            {"pid": pid, "name": name, "rss": format_bytes(rss)}
+            for pid, name, rss, _ in sorted(processes, key=lambda p: p[2], reverse=True)[:top]
+        ],
+        "Top processes by CPU time": [
+            {"pid": pid, "name": name, "cpu seconds": round(cpu_seconds, 1)}
+            for pid, name, _, cpu_seconds in sorted(processes, key=lambda p: p[3], reverse=True)[:top]
+        ],
+    }
+    return json.dumps(metrics, indent=2)
+
+def chat(messages, model="llama3.1-70b", temperature=0.75, max_tokens=4096, tool_choice="auto", stream=False, on_tool_call=None):
+    """Gets response from the AI model, streaming tokens as they arrive if stream is set."""
+    if stream:
+        return stream_chat(messages, model, temperature, max_tokens, tool_choice, on_tool_call)
+
+    response = get_client().chat.completions.create(
         messages=messages,
         model=model,
         temperature=temperature,
@@ -198,6 +788,79 @@ def chat(messages, model="llama3.1-70b", temperature=0.75, max_tokens=4096, tool
     print(f"{bcolors.OKBLUE}{full_response}{bcolors.ENDC}") 
     return full_response, tool_calls
 
+def stream_chat(messages, model="llama3.1-70b", temperature=0.75, max_tokens=4096, tool_choice="auto", on_tool_call=None):
+    """Streams the response from the AI model, printing tokens as they arrive.
+
+    Tool calls are rebuilt from the streamed deltas. If on_tool_call is given it is
+    called with each tool call as soon as its arguments are complete, so the caller
+    can start running it while the rest of the response is still being generated.
+    """
+    response = get_client().chat.completions.create(
+        messages=messages,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        tools=tools,
+        tool_choice=tool_choice,
+        stream=True,
+    )
+
+    content_parts = []
+    tool_calls = []
+    completed = set()
+
+    def complete_tool_call(index):
+        if index in completed:
+            return
+        completed.add(index)
+        if on_tool_call:
+            on_tool_call(tool_calls[index])
+
+    print(bcolors.OKBLUE, end="", flush=True)
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            print(delta.content, end="", flush=True)
+            content_parts.append(delta.content)
+
+        for tool_call_delta in delta.tool_calls or []:
+            index = tool_call_delta.index if tool_call_delta.index is not None else len(tool_calls) - 1
+            # A new index means every earlier tool call has been fully streamed
+            while len(tool_calls) <= index:
+                for earlier in range(len(tool_calls)):
+                    complete_tool_call(earlier)
+                tool_calls.append(SimpleNamespace(
+                    id=None,
+                    type="function",
+                    function=SimpleNamespace(name="", arguments=""),
+                ))
+
+            tool_call = tool_calls[index]
+            if tool_call_delta.id:
+                tool_call.id = tool_call_delta.id
+            function = tool_call_delta.function
+            if function and function.name:
+                tool_call.function.name += function.name
+            if function and function.arguments:
+                tool_call.function.arguments += function.arguments
+                # The arguments are complete as soon as they parse as a JSON object
+                if tool_call.id and tool_call.function.arguments.rstrip().endswith("}"):
+                    try:
+                        json.loads(tool_call.function.arguments)
+                        complete_tool_call(index)
+                    except json.JSONDecodeError:
+                        pass
+
+    for index in range(len(tool_calls)):
+        complete_tool_call(index)
+    print(bcolors.ENDC)
+
+    full_response = "".join(content_parts) or None
+    return full_response, tool_calls or None
+
 def save_command_history(command, output, filename="command_history.txt"):
     with open(filename, "a") as f:
         f.write(f"Time: {datetime.datetime.now()}\n")
@@ -205,83 +868,213 @@ def save_command_history(command, output, filename="command_history.txt"):
         f.write(f"Output:\n{output}\n")
         f.write("-" * 50 + "\n")
 
-def handle_tool_calls(tool_calls, trust_mode):
-    """Processes and executes tool calls made by the assistant based on the trust mode."""
-    if tool_calls:
-        print(f"\n{bcolors.HEADER}Tool Calls: {tool_calls}{bcolors.ENDC}")
-        for tool_call in tool_calls:
-            if tool_call.function.name == "execute_command":
-                function_args = json.loads(tool_call.function.arguments)
-                command = function_args.get("command")
-
-                result = execute_linux_command(command, trust_mode)
-                print(f"\n{bcolors.OKCYAN}Command: {command}\nResult:\n{result}{bcolors.ENDC}")
-
-                save_command_history(command, result)
-
-                context_history.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": "execute_command",
-                    "content": result 
-                })
-            elif tool_call.function.name == "WebTool":
-                function_args = json.loads(tool_call.function.arguments)
-                query = function_args.get("query")
-
-                result = WebTool(query)
-
-                # Instead of appending to context_history, return the result
-                return result 
-            elif tool_call.function.name == "schedule_task":
-                function_args = json.loads(tool_call.function.arguments)
-                task_name = function_args.get("task_name")
-                command = function_args.get("command")
-                interval = function_args.get("interval")
-
-                if trust_mode == "full":
-                    schedule_task(task_name, command, interval)
-                    result = f"{bcolors.OKGREEN}Task '{task_name}' scheduled to run command '{command}' every {interval} seconds.{bcolors.ENDC}"
-                elif trust_mode == "half":
-                    user_input = input(f"\n{bcolors.WARNING}The assistant wants to schedule a task:\nName: {task_name}\nCommand: {command}\nInterval: {interval} seconds\nDo you want to allow this? (y/n): {bcolors.ENDC}").strip().lower()
-                    if user_input == "y":
-                        schedule_task(task_name, command, interval)
-                        result = f"{bcolors.OKGREEN}Task '{task_name}' scheduled to run command '{command}' every {interval} seconds.{bcolors.ENDC}"
-                    else:
-                        result = f"{bcolors.WARNING}Task scheduling disallowed by the user.{bcolors.ENDC}"
-                else:  # trust_mode == "none"
-                    result = f"{bcolors.WARNING}Task scheduling is disabled in this trust mode.{bcolors.ENDC}"
-
-                context_history.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": "schedule_task",
-                    "content": result
-                })
-            elif tool_call.function.name == "remove_scheduled_task":
-                function_args = json.loads(tool_call.function.arguments)
-                task_name = function_args.get("task_name")
-
-                if trust_mode == "full":
-                    remove_scheduled_task(task_name)
-                    result = f"{bcolors.OKGREEN}Task '{task_name}' removed from schedule.{bcolors.ENDC}"
-                elif trust_mode == "half":
-                    user_input = input(f"\n{bcolors.WARNING}The assistant wants to remove the scheduled task '{task_name}'.\nDo you want to allow this? (y/n): {bcolors.ENDC}").strip().lower()
-                    if user_input == "y":
-                        remove_scheduled_task(task_name)
-                        result = f"{bcolors.OKGREEN}Task '{task_name}' removed from schedule.{bcolors.ENDC}"
-                    else:
-                        result = f"{bcolors.WARNING}Task removal disallowed by the user.{bcolors.ENDC}"
-                else:  # trust_mode == "none"
-                    result = f"{bcolors.WARNING}Task removal is disabled in this trust mode.{bcolors.ENDC}"
-
-                context_history.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": "remove_scheduled_task",
-                    "content": result
-                })
-    return ""  # Return an empty string if no tool calls were handled or no WebTool call
+# Runs tool calls in the background, both while the response is still streaming and
+# when several calls in one turn can run at the same time
+tool_executor = ThreadPoolExecutor(max_workers=4)
+
+# Commands that only read system state, so they can run alongside each other
+read_only_commands = {
+    "ls", "cat", "head", "tail", "grep", "egrep", "wc", "cut", "stat", "file",
+    "df", "du", "free", "uname", "uptime", "whoami", "id", "ps", "pwd", "which", "whereis",
+    "lsblk", "lscpu", "lspci", "lsusb", "echo", "printenv", "nproc",
+}
+
+def is_read_only_command(command):
+    """Conservatively decides whether a command only reads state (pipes allowed, no redirects or chaining)."""
+    if not command or re.search(r'[;&<>`\n]|\$\(', command):
+        return False
+    for segment in command.split("|"):
+        words = segment.split()
+        if not words or words[0] not in read_only_commands:
+            return False
+    return True
+
+def start_tool_call(tool_call, trust_mode, started):
+    """Starts a streamed tool call in the background if it needs no confirmation from the user.
+
+    Commands are only started early while every command before them in the response was
+    too, so they never run ahead of a command they might depend on. Commands that are
+    not started are recorded in started as None.
+    """
+    try:
+        function_args = json.loads(tool_call.function.arguments)
+    except json.JSONDecodeError:
+        return
+    if tool_call.function.name == "execute_command":
+        command = function_args.get("command")
+        if trust_mode == "full" and is_read_only_command(command) and None not in started.values():
+            started[tool_call.id] = tool_executor.submit(execute_linux_command, command, trust_mode, live=False)
+        else:
+            started[tool_call.id] = None
+    elif tool_call.function.name == "WebTool":
+        started[tool_call.id] = tool_executor.submit(WebTool, function_args.get("query"))
+
+def prepare_tool_call(tool_call, trust_mode):
+    """Parses a tool call and settles its trust-mode confirmation.
+
+    Returns a dict with either the final "result" (for refused calls) or a "run"
+    callable taking the live flag.
+    """
+    name = tool_call.function.name
+    function_args = json.loads(tool_call.function.arguments or "{}")
+    job = {"tool_call": tool_call, "name": name, "args": function_args}
+
+    if name == "execute_command":
+        command = function_args.get("command")
+        job["command"] = command
+        if trust_mode == "half":
+            user_input = input(f"\n{bcolors.WARNING}The assistant suggests running the following command:\n'{command}'\nDo you want to execute this command? (y/n): {bcolors.ENDC}").strip().lower()
+            if user_input != "y":
+                job["result"] = f"{bcolors.WARNING}Command execution disallowed by the user.{bcolors.ENDC}"
+                return job
+        job["run"] = lambda live: execute_linux_command(command, trust_mode, live=live, confirmed=True)
+    elif name == "WebTool":
+        job["run"] = lambda live: WebTool(function_args.get("query"))
+    elif name == "get_system_metrics":
+        job["run"] = lambda live: get_system_metrics()
+    elif name == "get_task_results":
+        job["run"] = lambda live: get_task_results(function_args.get("task_name"), function_args.get("limit", 5))
+    elif name == "schedule_task":
+        task_name = function_args.get("task_name")
+        command = function_args.get("command")
+        interval = function_args.get("interval")
+
+        def try_schedule():
+            try:
+                schedule_task(
+                    task_name, command, interval, function_args.get("overlap", "skip"), function_args.get("catch_up", "once"),
+                    function_args.get("notify", "change"), function_args.get("threshold"),
+                )
+            except (TypeError, ValueError) as e:
+                return f"{bcolors.FAIL}Task '{task_name}' could not be scheduled: {e}{bcolors.ENDC}"
+            return f"{bcolors.OKGREEN}Task '{task_name}' scheduled to run command '{command}' every {interval} seconds.{bcolors.ENDC}"
+
+        if trust_mode == "full":
+            job["run"] = lambda live: try_schedule()
+        elif trust_mode == "half":
+            user_input = input(f"\n{bcolors.WARNING}The assistant wants to schedule a task:\nName: {task_name}\nCommand: {command}\nInterval: {interval} seconds\nDo you want to allow this? (y/n): {bcolors.ENDC}").strip().lower()
+            if user_input == "y":
+                job["run"] = lambda live: try_schedule()
+            else:
+                job["result"] = f"{bcolors.WARNING}Task scheduling disallowed by the user.{bcolors.ENDC}"
+        else:  # trust_mode == "none"
+            job["result"] = f"{bcolors.WARNING}Task scheduling is disabled in this trust mode.{bcolors.ENDC}"
+    elif name == "remove_scheduled_task":
+        task_name = function_args.get("task_name")
+
+        def remove():
+            remove_scheduled_task(task_name)
+            return f"{bcolors.OKGREEN}Task '{task_name}' removed from schedule.{bcolors.ENDC}"
+
+        if trust_mode == "full":
+            job["run"] = lambda live: remove()
+        elif trust_mode == "half":
+            user_input = input(f"\n{bcolors.WARNING}The assistant wants to remove the scheduled task '{task_name}'.\nDo you want to allow this? (y/n): {bcolors.ENDC}").strip().lower()
+            if user_input == "y":
+                job["run"] = lambda live: remove()
+            else:
+                job["result"] = f"{bcolors.WARNING}Task removal disallowed by the user.{bcolors.ENDC}"
+        else:  # trust_mode == "none"
+            job["result"] = f"{bcolors.WARNING}Task removal is disabled in this trust mode.{bcolors.ENDC}"
+    else:
+        job["result"] = f"{bcolors.FAIL}Unknown tool '{name}'.{bcolors.ENDC}"
+    return job
+
+# Tools whose side effects must happen in the order the calls were made
+ordered_tools = {"execute_command", "schedule_task", "remove_scheduled_task"}
+
+def run_command_stages(jobs):
+    """Runs command and task scheduling jobs in order, letting consecutive read-only commands run together.
+
+    Any other job waits for the jobs before it and runs on its own, with a command's
+    output streamed live.
+    """
+    def read_only(job):
+        return job["name"] == "execute_command" and is_read_only_command(job["command"])
+
+    stages = []
+    for job in jobs:
+        if stages and read_only(job) and all(read_only(other) for other in stages[-1]):
+            stages[-1].append(job)
+        else:
+            stages.append([job])
+
+    for stage in stages:
+        if len(stage) == 1 and "future" not in stage[0]:
+            job = stage[0]
+            if job["name"] == "execute_command":
+                # The output is streamed to the terminal while the command runs
+                print(f"\n{bcolors.OKCYAN}Command: {job['command']}{bcolors.ENDC}")
+                job["printed"] = True
+            job["result"] = job["run"](True)
+            continue
+        for job in stage:
+            if "future" not in job:
+                job["future"] = tool_executor.submit(job["run"], False)
+        for job in stage:
+            job["result"] = job.pop("future").result()
+
+def handle_tool_calls(tool_calls, trust_mode, started=None):
+    """Processes and executes tool calls made by the assistant based on the trust mode.
+
+    Confirmations are asked up front, one call at a time. Web searches and metrics then
+    run alongside the commands, which run in call order together with task scheduling
+    changes, except that consecutive read-only commands run together. Results are added
+    to context_history in the order the calls were made.
+    started maps tool call ids to futures for calls already launched by start_tool_call.
+
+    If every call is a WebTool search, the combined answers are returned to be used as the
+    assistant's reply. Otherwise all results go into context_history and "" is returned.
+    """
+    started = started or {}
+    if not tool_calls:
+        return ""  # Return an empty string if no tool calls were handled
+    print(f"\n{bcolors.HEADER}Tool Calls: {tool_calls}{bcolors.ENDC}")
+
+    jobs = []
+    for tool_call in tool_calls:
+        if started.get(tool_call.id):
+            function_args = json.loads(tool_call.function.arguments)
+            job = {"tool_call": tool_call, "name": tool_call.function.name, "args": function_args, "future": started[tool_call.id]}
+            if job["name"] == "execute_command":
+                job["command"] = function_args.get("command")
+        else:
+            job = prepare_tool_call(tool_call, trust_mode)
+        jobs.append(job)
+
+    # Independent tools start straight away; commands and task changes run in dependency-safe stages
+    for job in jobs:
+        if job["name"] not in ordered_tools and "run" in job and "future" not in job:
+            job["future"] = tool_executor.submit(job["run"], False)
+    run_command_stages([job for job in jobs if job["name"] in ordered_tools and "result" not in job])
+    for job in jobs:
+        if "future" in job:
+            job["result"] = job.pop("future").result()
+
+    if all(job["name"] == "WebTool" for job in jobs):
+        # Instead of appending to context_history, return the result
+        return "\n\n".join(job["result"] for job in jobs if isinstance(job["result"], str) and job["result"])
+
+    for job in jobs:
+        result = job["result"]
+        if job["name"] == "execute_command":
+            if not job.get("printed"):
+                print(f"\n{bcolors.OKCYAN}Command: {job['command']}\nResult:\n{result}{bcolors.ENDC}")
+            save_command_history(job["command"], result)
+        elif job["name"] == "WebTool":
+            print(f"\n{bcolors.OKCYAN}WebTool: {job['args'].get('query')}\nResult:\n{result}{bcolors.ENDC}")
+        elif job["name"] == "get_system_metrics":
+            print(f"\n{bcolors.OKCYAN}System metrics:\n{result}{bcolors.ENDC}")
+        elif job["name"] == "get_task_results":
+            print(f"\n{bcolors.OKCYAN}Scheduled task results:\n{result}{bcolors.ENDC}")
+
+        context_history.append({
+            "role": "tool",
+            "tool_call_id": job["tool_call"].id,
+            "name": job["name"],
+            "content": result
+        })
+    return ""
 
 
 def get_user_preferences(filename="user_pref.json"):
@@ -307,12 +1100,29 @@ def get_user_preferences(filename="user_pref.json"):
             else:
                 print(f"{bcolors.FAIL}Invalid communication mode. Please enter 'audio' or 'text'.{bcolors.ENDC}")
 
+        while True:
+            streaming = input(f"{bcolors.OKCYAN}Stream responses as they are generated? (y/n): {bcolors.ENDC}").strip().lower()
+            if streaming in ["y", "n"]:
+                break
+            else:
+                print(f"{bcolors.FAIL}Invalid choice. Please enter 'y' or 'n'.{bcolors.ENDC}")
+
+        hands_free = "n"
+        while communication_mode == "audio":
+            hands_free = input(f"{bcolors.OKCYAN}Detect when you start and stop speaking instead of pressing Enter? (y/n): {bcolors.ENDC}").strip().lower()
+            if hands_free in ["y", "n"]:
+                break
+            else:
+                print(f"{bcolors.FAIL}Invalid choice. Please enter 'y' or 'n'.{bcolors.ENDC}")
+
         user_preferences = {
             "name": user_name,
             "linux_username": linux_username,
             "linux_distro": linux_distro,
             "trust_mode": trust_mode,
-            "communication": communication_mode
+            "communication": communication_mode,
+            "streaming": streaming == "y",
+            "voice_activity_detection": hands_free == "y"
         }
 
         with open(filename, "w") as f:
@@ -320,8 +1130,121 @@ def get_user_preferences(filename="user_pref.json"):
 
         return user_preferences
 
+# Shared async HTTP fetch engine
+class FetchEngine:
+    """Runs all scraper HTTP traffic on one asyncio event loop in a daemon thread.
+
+    Requests share a single httpx client with a bounded keep-alive connection pool
+    (HTTP/2 when the h2 package is installed), and at most per_host requests go to
+    the same host at once. The synchronous helpers can be called from any thread.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive=10, keepalive_expiry=30, per_host=4):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.per_host = per_host
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self.loop = None
+        self.client = None
+        self.host_limits = {}
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+            self.client = asyncio.run_coroutine_threadsafe(self._create_client(), self.loop).result()
+
+    async def _create_client(self):
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return httpx.AsyncClient(limits=limits, http2=self.http2, follow_redirects=True)
+
+    def submit(self, coro):
+        """Schedules a coroutine on the engine's loop and returns a concurrent.futures.Future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _host_limit(self, url):
+        host = httpx.URL(url).host
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[host]
+
+    async def fetch(self, url, timeout=3, headers=None, stop=None, max_bytes=1_000_000,
+                    allowed_types=("text/html", "application/xhtml+xml", "text/plain")):
+        """Returns the body of url as text, or "" on errors and non-2xx responses.
+
+        The body is streamed and never buffered beyond max_bytes, and responses whose
+        Content-Type is not in allowed_types are dropped before any of the body is read.
+        If stop is given it is called with the text read so far after every chunk,
+        and reading ends as soon as it returns True.
+        """
+        try:
+            async with self._host_limit(url):
+                async with self.client.stream("GET", url, headers=headers, timeout=timeout) as response:
+                    if not response.is_success:
+                        return ""
+                    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                    if allowed_types and content_type and content_type not in allowed_types:
+                        return ""
+                    try:
+                        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                    except LookupError:
+                        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+                    content = ""
+                    bytes_read = 0
+                    async for chunk in response.aiter_bytes():
+                        if max_bytes and bytes_read + len(chunk) > max_bytes:
+                            chunk = chunk[:max_bytes - bytes_read]
+                        bytes_read += len(chunk)
+                        content += decoder.decode(chunk)
+                        if (max_bytes and bytes_read >= max_bytes) or (stop and stop(content)):
+                            break
+                    return content + decoder.decode(b"", final=True)
+        except (httpx.HTTPError, httpx.InvalidURL):
+            return ""
+
+    async def _get(self, url, timeout, headers):
+        async with self._host_limit(url):
+            return await self.client.get(url, headers=headers, timeout=timeout)
+
+    def get(self, url, timeout=10, headers=None):
+        """Performs a single GET and returns the httpx response."""
+        return self.submit(self._get(url, timeout, headers)).result()
+
+    def fetch_all(self, urls, timeout=3, headers=None, stop=None, make_stop=None, deadline=None):
+        """Fetches urls concurrently and yields (url, text) pairs in completion order.
+
+        make_stop, if given, is called once per URL to build a fresh stop predicate
+        for stateful predicates. If deadline is set, iteration ends once that many
+        seconds have passed and the URLs that have not arrived are never yielded.
+        Requests still in flight are cancelled when iteration ends early.
+        """
+        future_to_url = {
+            self.submit(self.fetch(url, timeout, headers, make_stop() if make_stop else stop)): url
+            for url in urls
+        }
+        try:
+            for future in as_completed(future_to_url, timeout=deadline):
+                yield future_to_url[future], future.result()
+        except FuturesTimeoutError:
+            pass
+        finally:
+            for future in future_to_url:
+                future.cancel()
+
+fetch_engine = FetchEngine()
+
 # WebTool implementation
-def google_search(query, num_results=10, num_threads=12):
+def google_search(query, num_results=10):
     encoded_query = quote_plus(query)
     base_url = "https://www.google.com/search"
     urls = [f"{base_url}?q={encoded_query}&start={i}" for i in range(0, min(num_results * 2, 100), 10)]
@@ -332,19 +1255,8 @@ def google_search(query, num_results=10, num_threads=12):
 
     result_urls = deque(maxlen=num_results)
 
-    def fetch_search_page(session, url):
-        try:
-            with session.get(url, headers=headers, timeout=1, stream=True) as response:
-                if response.status_code == 200:
-                    content = ''
-                    for chunk in response.iter_content(chunk_size=1024):
-                        content += chunk.decode('utf-8', errors='ignore')
-                        if len(re.findall(r'href="(https?://[^"]+)"', content)) >= 10:
-                            break
-                    return content
-        except requests.RequestException:
-            pass
-        return None
+    def has_enough_links(content):
+        return len(re.findall(r'href="(https?://[^"]+)"', content)) >= 10
 
     def parse_search_urls(content):
         if not content:
@@ -353,90 +1265,539 @@ def google_search(query, num_results=10, num_threads=12):
         return [url.split('&')[0] for url in urls 
                 if not url.startswith(("https://www.google.", "https://google.", "https://webcache.googleusercontent.com"))]
 
-    with requests.Session() as session:
-        session.headers.update(headers)
-
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            future_to_url = {executor.submit(fetch_search_page, session, url): url for url in urls}
-            for future in as_completed(future_to_url):
-                content = future.result()
-                if content:
-                    result_urls.extend(parse_search_urls(content))
-                    if len(result_urls) >= num_results:
-                        for f in future_to_url:
-                            f.cancel()
-                        break
+    for url, content in fetch_engine.fetch_all(urls, timeout=1, headers=headers, stop=has_enough_links):
+        if content:
+            result_urls.extend(parse_search_urls(content))
+            if len(result_urls) >= num_results:
+                break
 
     return list(result_urls)[:num_results]
 
-def fetch_url(session, url, timeout=3):
-    try:
-        response = session.get(url, timeout=timeout, headers={'User-Agent': 'Mozilla/5.0'})
-        return response.text
-    except requests.RequestException:
-        return ""
+def has_enough_text(max_length=10000):
+    """Returns a stop predicate for fetches that is true once the page holds max_length characters of paragraph text.
 
-def extract_content(html_content, max_length=10000):
-    try:
-        tree = HTMLParser(html_content)
-        if tree.body is None:
-            return ""
+    Only the part of the page after the last complete paragraph is scanned on each call.
+    """
+    paragraph_pattern = re.compile(r'<p\b[^>]*>(.*?)</p>', re.IGNORECASE | re.DOTALL)
+    tag_pattern = re.compile(r'<[^>]+>')
+    state = {"pos": 0, "chars": 0}
 
-        paragraphs = tree.css("p, article, section")
-        text = ' '.join(p.text() for p in paragraphs if p.text())
-        return text[:max_length]
-    except Exception:
-        return ""
+    def stop(content):
+        for match in paragraph_pattern.finditer(content, state["pos"]):
+            state["chars"] += len(tag_pattern.sub('', match.group(1)).strip())
+            state["pos"] = match.end()
+        return state["chars"] >= max_length
+
+    return stop
+
+ad_pattern = re.compile(r'(?i)sponsored\s*content|advertisement|sponsored\s*by|promoted\s*content|\[ad\]|click\s*here\s*to\s*advertise')
 
 def clean_content(content):
     if not content:
         return ""
     content = re.sub(r'\s+', ' ', content).strip()
-    content = re.sub(r'(?i)sponsored\s*content|advertisement|sponsored\s*by|promoted\s*content|\[ad\]|click\s*here\s*to\s*advertise', '', content)
+    content = ad_pattern.sub('', content)
     return content
 
-def process_url(session, url):
-    html_content = fetch_url(session, url)
-    if not html_content:
+# Page furniture that never holds the answer to a query
+boilerplate_selectors = (
+    "script, style, noscript, template, iframe, svg, canvas, form, button, "
+    "aside, [role=navigation], [role=banner], [role=contentinfo], [aria-hidden=true]"
+)
+# Site chrome, dropped only at page level: an <article>'s own <header> often holds its title
+page_chrome_selectors = "nav, header, footer"
+sectioning_tags = {"article", "main", "section"}
+block_tags = {"h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "blockquote", "dt", "dd", "td", "th"}
+inline_tags = {"-text", "a", "abbr", "b", "cite", "code", "em", "i", "kbd", "label", "mark", "q", "s",
+               "small", "span", "strong", "sub", "sup", "time", "u"}
+
+def has_ancestor(node, tags):
+    parent = node.parent
+    while parent is not None:
+        if parent.tag in tags:
+            return True
+        parent = parent.parent
+    return False
+
+def html_to_markdown(url, html_content):
+    """Converts a page to header-structured Markdown using selectolax.
+
+    The page is parsed once; boilerplate is dropped, headings become #-style headers for
+    MarkdownHeaderTextSplitter, links are resolved against the page URL and each block is
+    emitted once in document order. Text sitting directly in containers such as <div>
+    becomes a paragraph of its own.
+    """
+    tree = HTMLParser(html_content)
+    root = tree.body
+    if root is None:
         return ""
-    
-    cleaned_content = clean_content(html_content)
-    return f"{cleaned_content}"
 
-def save_result_as_markdown(url, result):
+    for node in tree.css(boilerplate_selectors):
+        node.decompose()
+    for node in tree.css(page_chrome_selectors):
+        if not has_ancestor(node, sectioning_tags):
+            node.decompose()
+    for link in root.css("a[href]"):
+        text = re.sub(r'\s+', ' ', link.text()).strip()
+        href = link.attributes.get("href") or ""
+        if text and not href.startswith(("#", "javascript:")):
+            link.replace_with(f"[{text}]({urljoin(url, href)})")
+
+    blocks = []
+    loose_text = []
+
+    def add_paragraph(text):
+        text = ad_pattern.sub('', re.sub(r'\s+', ' ', text)).strip()
+        if text:
+            blocks.append(text)
+
+    for node in root.traverse(include_text=True):
+        if node.tag not in block_tags:
+            # Text outside every block is gathered into paragraphs, which end at the
+            # next element that is not inline
+            if node.tag == "-text":
+                if not has_ancestor(node, block_tags):
+                    loose_text.append(node.text(deep=False))
+            elif node.tag not in inline_tags and loose_text:
+                add_paragraph("".join(loose_text))
+                loose_text = []
+            continue
+        # Nested blocks (a <p> inside an <li>) are covered by their outermost block
+        if has_ancestor(node, block_tags):
+            continue
+        if loose_text:
+            add_paragraph("".join(loose_text))
+            loose_text = []
+
+        if node.tag == "pre":
+            text = node.text().strip("\n")
+            if text.strip():
+                blocks.append(f"```\n{text}\n```")
+            continue
+
+        text = ad_pattern.sub('', re.sub(r'\s+', ' ', node.text(separator=' '))).strip()
+        if not text:
+            continue
+        if node.tag[0] == "h" and node.tag[1:].isdigit():
+            blocks.append(f"{'#' * int(node.tag[1])} {text}")
+        elif node.tag == "li":
+            blocks.append(f"- {text}")
+        elif node.tag == "blockquote":
+            blocks.append(f"> {text}")
+        else:
+            blocks.append(text)
+    if loose_text:
+        add_paragraph("".join(loose_text))
+
+    return "\n\n".join(blocks)
+
+def convert_page(url, html_content):
+    """Returns a fetched page's text on one line together with its Markdown conversion."""
+    if not html_content:
+        return "", ""
+    markdown = html_to_markdown(url, html_content)
+    return clean_content(markdown), markdown
+
+markdown_headers = [("#", "Header 1"), ("##", "Header 2"), ("###", "Header 3"), ("####", "Header 4")]
+
+def parse_page(url, html_content):
+    """Converts and splits one page. Runs in the parse pool's worker processes.
+
+    Returns the page's one-line text, its Markdown, and its header splits as
+    (text, metadata) pairs so the result pickles cheaply.
+    """
+    result, markdown = convert_page(url, html_content)
+    if not result:
+        return "", markdown, []
+    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=markdown_headers)
+    splits = [
+        (split.page_content, {**split.metadata, "source": url})
+        for split in markdown_splitter.split_text(markdown)
+    ]
+    return result, markdown, splits
+
+# Threads that embed parsed chunks while later pages are still being parsed. Kept apart from
+# tool_executor, whose workers may all be WebTool calls waiting on these jobs.
+embed_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embed")
+
+# Worker processes for the CPU-bound parsing stage, started on first use
+parse_pool = None
+parse_pool_lock = threading.Lock()
+
+def submit_parse(url, html_content):
+    """Submits a page to the parse pool, falling back to parsing inline if the pool is unusable."""
+    global parse_pool
+    with parse_pool_lock:
+        if parse_pool is None:
+            # forkserver avoids forking a parent that already runs the fetch engine's threads
+            parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("forkserver"))
+        try:
+            return parse_pool.submit(parse_page, url, html_content)
+        except (BrokenProcessPool, RuntimeError):
+            parse_pool = None
+    future = Future()
+    future.set_result(parse_page(url, html_content))
+    return future
+
+def save_result_as_markdown(url, markdown, folder='markdown'):
+    """Writes a page's Markdown to disk so the scrape pipeline can be inspected."""
     url_hash = hashlib.md5(url.encode()).hexdigest()
-    # Use the hash as the filename
-    filename = f"{url_hash}.md"
-    # Ensure the markdown directory exists
-    os.makedirs('markdown', exist_ok=True)
-    # Define the full path
-    filepath = os.path.join('markdown', filename)
-    # Parse the HTML content using BeautifulSoup
-    soup = BeautifulSoup(result, 'html.parser')
-    
-    # Fix relative URLs
-    for a in soup.find_all('a', href=True):
-        a['href'] = urljoin(url, a['href'])
-    
-    # Convert result to markdown and save it
-    with open(filepath, 'w') as file:
-        file.write(md(str(soup)))
-def delete_all_files_in_folder(folder_path):
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f"{url_hash}.md"), 'w') as file:
+        file.write(markdown)
+
+# WebTool answer cache
+def normalize_query(query):
+    """Normalizes case, whitespace and trailing punctuation of a search query for the cache key.
+
+    Other punctuation is kept, since it often carries the meaning ("C++", ">>", "&&").
+    """
+    query = re.sub(r'\s+', ' ', query.lower()).strip()
+    return re.sub(r'[\s?!.,;:]+$', '', query)
+
+def open_answer_cache(filename="webtool_cache.db"):
+    conn = sqlite3.connect(filename)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS answers ("
+        "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+    )
+    return conn
+
+def get_cached_answer(query, ttl=24 * 60 * 60, filename="webtool_cache.db"):
+    """Returns the cached answer for a query, or None if it is missing or older than ttl seconds."""
+    key = normalize_query(query)
+    now = time.time()
+    conn = open_answer_cache(filename)
+    try:
+        with conn:
+            row = conn.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > ttl:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+    except sqlite3.Error as e:
+        print(f"{bcolors.WARNING}WebTool cache lookup failed: {e}{bcolors.ENDC}")
+        return None
+    finally:
+        conn.close()
+
+def cache_answer(query, answer, max_entries=500, filename="webtool_cache.db"):
+    """Stores an answer and evicts the least recently used entries beyond max_entries."""
+    key = normalize_query(query)
+    now = time.time()
+    conn = open_answer_cache(filename)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now),
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE key NOT IN "
+                "(SELECT key FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (max_entries,),
+            )
+    except sqlite3.Error as e:
+        print(f"{bcolors.WARNING}WebTool cache update failed: {e}{bcolors.ENDC}")
+    finally:
+        conn.close()
+
+# Embedding cache for scraped chunks
+class CachedEmbeddings:
+    """Wraps an embeddings model with a content-addressed on-disk cache of document vectors.
+
+    Vectors are appended as raw float32 rows to one file per model and read back through
+    a memory map, while a small SQLite index maps sha256(model + text) to a row number.
+    Queries are always embedded fresh since they are rarely repeated verbatim.
+    """
+
+    def __init__(self, embeddings, model_name, folder="embedding_cache"):
+        # Registered as a langchain Embeddings here rather than subclassed, so langchain
+        # is only imported once embeddings are actually needed
+        Embeddings.register(CachedEmbeddings)
+        self.embeddings = embeddings
+        self.model_name = model_name
+        safe_name = re.sub(r'[^\w.-]', '_', model_name)
+        os.makedirs(folder, exist_ok=True)
+        self.index_path = os.path.join(folder, f"{safe_name}.db")
+        self.vectors_path = os.path.join(folder, f"{safe_name}.f32")
+        self.lock = threading.Lock()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        finally:
+            conn.close()
+        self.dim = self._get_dim()
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path)
+
+    def _get_dim(self):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def _load_rows(self, keys):
+        rows = {}
+        conn = self._connect()
         try:
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
+            unique_keys = list(set(keys))
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(conn.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch
+                ).fetchall())
+        finally:
+            conn.close()
+        return rows
+
+    def _store(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            row_bytes = self.dim * 4
+            with open(self.vectors_path, "ab") as f:
+                # A crash mid-append can leave a partial row at the end; cut it off so the
+                # new rows start on a row boundary
+                size = f.seek(0, os.SEEK_END)
+                first_row = size // row_bytes
+                if size % row_bytes:
+                    f.truncate(first_row * row_bytes)
+                f.write(vectors.tobytes())
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO vectors (key, row) VALUES (?, ?)",
+                        [(key, first_row + i) for i, key in enumerate(keys)],
+                    )
+            finally:
+                conn.close()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        keys = [self._key(text) for text in texts]
+        rows = self._load_rows(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in rows and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            self._store(list(missing.keys()), new_vectors)
+            rows = self._load_rows(keys)
+
+        with self.lock:
+            whole_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            stored = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(whole_rows, self.dim))
+            return [stored[rows[key]].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+# Persistent vector index of scraped pages
+web_index = None
+web_index_lock = threading.Lock()
+
+def load_web_index(embeddings, folder="faiss_index"):
+    if os.path.exists(os.path.join(folder, "index.faiss")):
+        try:
+            return FAISS.load_local(folder, embeddings, allow_dangerous_deserialization=True)
         except Exception as e:
-            print(f'Failed to delete {file_path}. Reason: {e}')
+            print(f"{bcolors.WARNING}Could not load the web index, starting a new one: {e}{bcolors.ENDC}")
+    return None
+
+def evict_stale_pages(index, max_age=7 * 24 * 60 * 60):
+    """Removes chunks scraped more than max_age seconds ago from the index."""
+    cutoff = time.time() - max_age
+    stale_ids = [
+        doc_id for doc_id in index.index_to_docstore_id.values()
+        if index.docstore.search(doc_id).metadata.get("scraped_at", 0) < cutoff
+    ]
+    if stale_ids and len(stale_ids) < len(index.index_to_docstore_id):
+        index.delete(stale_ids)
+        return len(stale_ids)
+    return 0
+
+def update_web_index(documents, embeddings, folder="faiss_index", max_age=7 * 24 * 60 * 60):
+    """Adds scraped chunks to the persistent FAISS index and saves it to disk.
+
+    Chunks are identified by a hash of their source URL and content, so chunks that are
+    already indexed are not embedded again. When a page is re-scraped with different
+    content, its old chunks are replaced. Chunks older than max_age are evicted.
+    """
+    global web_index
+    with web_index_lock:
+        if web_index is None:
+            web_index = load_web_index(embeddings, folder)
+
+        now = time.time()
+        new_documents = {}
+        for document in documents:
+            source = document.metadata.get("source", "")
+            content_hash = hashlib.sha256(document.page_content.encode()).hexdigest()
+            doc_id = hashlib.sha256(f"{source}\0{content_hash}".encode()).hexdigest()
+            document.metadata["content_hash"] = content_hash
+            document.metadata["scraped_at"] = now
+            new_documents[doc_id] = document
+
+        if web_index is None:
+            if not new_documents:
+                raise ValueError("No documents to build the web index from.")
+            web_index = FAISS.from_documents(list(new_documents.values()), embeddings, ids=list(new_documents.keys()))
+        else:
+            indexed_ids = set(web_index.index_to_docstore_id.values())
+            sources = {document.metadata.get("source") for document in new_documents.values()}
+            # Chunks from the re-scraped pages that no longer exist on the page
+            outdated_ids = [
+                doc_id for doc_id in indexed_ids
+                if doc_id not in new_documents and web_index.docstore.search(doc_id).metadata.get("source") in sources
+            ]
+            # Already indexed chunks only need their timestamp refreshed
+            for doc_id in indexed_ids & new_documents.keys():
+                web_index.docstore.search(doc_id).metadata["scraped_at"] = now
+            added = {doc_id: document for doc_id, document in new_documents.items() if doc_id not in indexed_ids}
+            if added:
+                web_index.add_documents(list(added.values()), ids=list(added.keys()))
+            if outdated_ids:
+                web_index.delete(outdated_ids)
+
+        evicted = evict_stale_pages(web_index, max_age)
+        if evicted:
+            print(f"{bcolors.OKCYAN}Evicted {evicted} stale chunks from the web index{bcolors.ENDC}")
+        web_index.save_local(folder)
+        return web_index
+
+def search_web_index(query_vector, k=10):
+    """Returns the k chunks closest to query_vector.
+
+    The search holds web_index_lock, so it never runs while another WebTool call is adding
+    or deleting chunks. The query is embedded by the caller, outside the lock.
+    """
+    with web_index_lock:
+        if web_index is None:
+            return []
+        return web_index.similarity_search_by_vector(query_vector, k=k)
+
+# Clients and chains shared by every WebTool call, built on first use
+webtool_clients = {}
+webtool_clients_lock = threading.Lock()
+
+def get_embeddings():
+    with webtool_clients_lock:
+        if "embeddings" not in webtool_clients:
+            webtool_clients["embeddings"] = CachedEmbeddings(CohereEmbeddings(model=embedding_model), embedding_model)
+        return webtool_clients["embeddings"]
+
+def get_retrieval_qa_prompt():
+    """Returns a vendored copy of the langchain-ai/retrieval-qa-chat hub prompt.
+
+    Keeping it in the code pins its version and saves a hub round-trip on every web search.
+    """
+    return ChatPromptTemplate.from_messages([
+        ("system", "Answer any use questions based solely on the context below:\n\n<context>\n{context}\n</context>"),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        ("human", "{input}"),
+    ])
+
+def get_combine_docs_chain():
+    with webtool_clients_lock:
+        if "combine_docs_chain" not in webtool_clients:
+            # Initialize the LLM (e.g., OpenAI's GPT-3)
+            genai.configure(api_key=os.getenv('GEM'))
+            llm = ChatGoogleGenerativeAI(
+                model="gemini-1.5-flash",
+                temperature=0.2,
+                max_tokens=None,
+                verbose=True,
+            )
+            webtool_clients["combine_docs_chain"] = create_stuff_documents_chain(
+                llm, get_retrieval_qa_prompt()
+            )
+        return webtool_clients["combine_docs_chain"]
+
+# Startup warm-up
+def configure_connection_pool(settings=None):
+    """Applies connection pool settings from user_pref.json. Must run before the first
+    chat or fetch, since the clients read them once when they are built."""
+    connection_pool.update(settings or {})
+    fetch_engine.max_connections = connection_pool["max_connections"]
+    fetch_engine.max_keepalive = connection_pool["max_keepalive"]
+    fetch_engine.keepalive_expiry = connection_pool["keepalive_expiry"]
+
+def warm_up_llm():
+    # Listing models is the cheapest authenticated call, and it leaves a TLS connection
+    # to the endpoint in the client's pool
+    get_client().models.list()
+
+def warm_up_search():
+    fetch_engine.get("https://www.googleapis.com/", timeout=5)
+
+def warm_up_embeddings():
+    cohere_client = getattr(get_embeddings().embeddings, "client", None)
+    if hasattr(cohere_client, "check_api_key"):
+        cohere_client.check_api_key()
+
+def warm_up_connections():
+    """Builds the API clients and opens their connections in background threads while
+    the user types the first request, so the first turn does not pay for imports, TLS
+    handshakes and connection setup. Only services with a configured key are contacted.
+    Failures are ignored here; the real call reports them if they persist.
+    """
+    warm_ups = {
+        "LLM": (Cre, warm_up_llm),
+        "Google CSE": (cse_api_key, warm_up_search),
+        "Cohere": (cohere_key, warm_up_embeddings),
+        "Gemini": (os.getenv('GEM'), get_combine_docs_chain),
+    }
 
-def WebTool(query):
-    os.makedirs('markdown', exist_ok=True)
-    delete_all_files_in_folder('markdown')
-    url = f"https://www.googleapis.com/customsearch/v1?key={cse_api_key}&cx={search_engine_id}&q={query}"
-    response = requests.get(url)
+    def run(name, warm_up):
+        start = time.perf_counter()
+        try:
+            warm_up()
+        except Exception as e:
+            if import_report:
+                print(f"[warm-up] {name} failed: {e}")
+            return
+        if import_report:
+            print(f"[warm-up] {name}: {time.perf_counter() - start:.3f}s")
+
+    for name, (key, warm_up) in warm_ups.items():
+        if key:
+            threading.Thread(target=run, args=(name, warm_up), daemon=True).start()
+
+def WebTool(query, use_cache=True, save_markdown=None):
+    if save_markdown is None:
+        save_markdown = webtool_save_markdown
+    if use_cache:
+        cached = get_cached_answer(query)
+        if cached is not None:
+            print(f"{bcolors.OKCYAN}WebTool: answered from cache{bcolors.ENDC}")
+            return cached
+
+    url = f"https://www.googleapis.com/customsearch/v1?key={cse_api_key}&cx={search_engine_id}&q={quote_plus(query)}"
+    try:
+        response = fetch_engine.get(url)
+    except httpx.HTTPError as e:
+        print(f"Error: {e}")
+        return f"The web search for '{query}' failed: {e}"
     urls = []
 
     if response.status_code == 200:
@@ -456,72 +1817,66 @@ def WebTool(query):
         print(f"Error: {response.status_code}")
     if not urls:
         print("No URLs found.")
-        return "", []
+        return f"The web search for '{query}' found no results."
 
     results = []
     processed_urls = 0
     successful_urls = []
-
-    session = requests.Session()
-    max_workers = 100
-
-
-    with ThreadPoolExecutor(max_workers=max_workers) as fetch_executor:
-        future_to_url = {fetch_executor.submit(process_url, session, url): url for url in urls}
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            result = future.result()
-            save_result_as_markdown(url, result)
-            if result:
-                results.append(result)
-                successful_urls.append(url)
-            processed_urls += 1
+    embeddings = get_embeddings()
+
+    # Pages are parsed in worker processes as soon as they arrive
+    parse_futures = {}
+    arrived_urls = set()
+    for url, html_content in fetch_engine.fetch_all(urls, timeout=3, headers={'User-Agent': 'Mozilla/5.0'},
+                                                    make_stop=has_enough_text, deadline=webtool_fetch_budget):
+        arrived_urls.add(url)
+        parse_futures[submit_parse(url, html_content)] = (url, html_content)
+
+    dropped_urls = [url for url in urls if url not in arrived_urls]
+    if dropped_urls:
+        print(f"{bcolors.WARNING}Dropped {len(dropped_urls)} URL(s) that missed the {webtool_fetch_budget}s fetch budget: {dropped_urls}{bcolors.ENDC}")
+    if not arrived_urls:
+        # Answering from the index alone would only draw on older, unrelated pages
+        return f"No web pages could be fetched within {webtool_fetch_budget}s for '{query}'. Try the search again."
+
+    # Embed each page's chunks as soon as it is parsed, warming the embedding cache for the index update
+    md_header_splits = []
+    embed_futures = []
+    for future in as_completed(parse_futures):
+        url, html_content = parse_futures[future]
+        try:
+            result, markdown, splits = future.result()
+        except BrokenProcessPool:
+            result, markdown, splits = parse_page(url, html_content)
+        if save_markdown:
+            save_result_as_markdown(url, markdown)
+        if result:
+            results.append(result)
+            successful_urls.append(url)
+            page_splits = [Document(page_content=text, metadata=metadata) for text, metadata in splits]
+            md_header_splits.extend(page_splits)
+            if page_splits:
+                embed_futures.append(embed_executor.submit(embeddings.embed_documents, [split.page_content for split in page_splits]))
+        processed_urls += 1
+    for future in embed_futures:
+        future.result()
 
     relevant_text = "".join(results)
     # print the number of scrapped words
     print("Words Scrapped : " + str(len(relevant_text.split())))
+    if not md_header_splits:
+        return f"None of the web pages fetched for '{query}' had readable content."
 
-    markdown_folder = 'markdown'
-    headers_to_split_on = [("#", "Header 1"), ("##", "Header 2"), ("###", "Header 3"), ("####", "Header 4")]
-    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-
-    # Function to load and split markdown files
-    def load_and_split_markdown_files(folder_path):
-        all_splits = []
-        for filename in os.listdir(folder_path):
-            if filename.endswith('.md'):
-                file_path = os.path.join(folder_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-                    # Split the content using the headers
-                    md_header_splits = markdown_splitter.split_text(content)
-                    all_splits.extend(md_header_splits)
-        return all_splits
-
-    # Load and split markdown files
-    md_header_splits = load_and_split_markdown_files(markdown_folder)
-
-    # Initialize the retriever (assuming it's already defined)
-    retriever = FAISS.from_documents(
-        md_header_splits, CohereEmbeddings(model="embed-english-v3.0")
-    ).as_retriever(search_kwargs={"k": 10})
-
-    # Initialize the LLM (e.g., OpenAI's GPT-3)
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
-        temperature=0.2,
-        max_tokens=None,
-        verbose=True,
-    )
-    
-    retrieval_qa_chat_prompt = hub.pull("langchain-ai/retrieval-qa-chat")
-    combine_docs_chain = create_stuff_documents_chain(
-        llm, retrieval_qa_chat_prompt
-    )
-    retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
-    result = retrieval_chain.invoke({"input": query, "max_tokens": 1024})
-    
-    return result['answer']
+    # Add the new chunks to the persistent index and retrieve over everything scraped so far
+    update_web_index(md_header_splits, embeddings)
+    documents = search_web_index(embeddings.embed_query(query), k=10)
+
+    # The LLM and prompt are built once and shared by every query
+    answer = get_combine_docs_chain().invoke({"input": query, "context": documents})
+
+    if use_cache and answer:
+        cache_answer(query, answer)
+    return answer
     #safety_settings = [
     #    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
     #    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
@@ -546,41 +1901,306 @@ def WebTool(query):
 
 
 # Task Scheduling functions
+# Due times are kept in a heap of (next_run, sequence, task_name); entries for tasks that
+# were removed or rescheduled are skipped when they come up
+schedule_queue = []
+schedule_sequence = itertools.count()
+schedule_condition = threading.Condition()
+scheduler_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scheduled-task")
+schedule_save_lock = threading.Lock()
+
 def run_scheduled_tasks():
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    """Dispatches scheduled tasks to the worker pool, sleeping until the next one is due."""
+    with schedule_condition:
+        while True:
+            if not schedule_queue:
+                schedule_condition.wait()
+                continue
+            next_run, _, task_name = schedule_queue[0]
+            now = time.monotonic()
+            if next_run > now:
+                schedule_condition.wait(next_run - now)
+                continue
+
+            heapq.heappop(schedule_queue)
+            task = scheduled_tasks.get(task_name)
+            if task is None or task["next_run"] != next_run:
+                continue
+            dispatch_scheduled_task(task)
+
+            # Stay on the task's fixed grid so delays do not accumulate into drift
+            missed = int((now - next_run) // task["interval"])
+            if missed:
+                print(f"{bcolors.WARNING}Scheduled task '{task_name}' fell behind and skipped {missed} run(s){bcolors.ENDC}")
+            task["next_run"] = next_run + (missed + 1) * task["interval"]
+            heapq.heappush(schedule_queue, (task["next_run"], next(schedule_sequence), task_name))
+
+def dispatch_scheduled_task(task, max_queued=10):
+    """Starts a due task, applying its overlap policy if the previous run is still going.
+
+    Called with schedule_condition held.
+    """
+    if task["running"]:
+        if task["overlap"] == "queue" and task["queued"] < max_queued:
+            task["queued"] += 1
+        else:
+            task["skipped"] += 1
+            print(f"{bcolors.WARNING}Scheduled task '{task['name']}' is still running, skipping this run{bcolors.ENDC}")
+        return
+    task["running"] = True
+    scheduler_pool.submit(run_scheduled_task, task)
+
+def save_scheduled_tasks(filename="scheduled_tasks.json"):
+    """Writes the task definitions with their last and next run times (as Unix timestamps)."""
+    with schedule_condition:
+        now_wall, now_monotonic = time.time(), time.monotonic()
+        data = [
+            {
+                "name": task["name"],
+                "command": task["command"],
+                "interval": task["interval"],
+                "overlap": task["overlap"],
+                "catch_up": task["catch_up"],
+                "notify": task["notify"],
+                "threshold": task["threshold"],
+                "last_run": task["last_run"],
+                "next_run": now_wall + (task["next_run"] - now_monotonic),
+            }
+            for task in scheduled_tasks.values()
+        ]
+    with schedule_save_lock:
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_filename, filename)
+
+def restore_scheduled_tasks(filename="scheduled_tasks.json"):
+    """Re-creates the tasks saved by save_scheduled_tasks, applying each task's catch-up policy.
+
+    A task whose next run was missed while Gaurika was not running either runs once right
+    away ("once") or waits for its next slot on the original schedule ("skip").
+    """
+    try:
+        with open(filename, "r") as f:
+            saved_tasks = json.load(f)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError as e:
+        print(f"{bcolors.WARNING}Could not read saved scheduled tasks: {e}{bcolors.ENDC}")
+        return []
 
-def schedule_task(task_name, command, interval):
-    def job():
-        result = execute_linux_command(command, "full")
-        print(f"{bcolors.OKGREEN}Scheduled task '{task_name}' executed:\nCommand: {command}\nResult: {result}{bcolors.ENDC}")
-        save_command_history(command, result)
+    now = time.time()
+    for saved in saved_tasks:
+        interval = saved["interval"]
+        next_run = saved.get("next_run") or now
+        if next_run < now:
+            if saved.get("catch_up", "once") == "once":
+                next_run = now
+            else:
+                next_run += math.ceil((now - next_run) / interval) * interval
+        schedule_task(
+            saved["name"], saved["command"], interval, saved.get("overlap", "skip"),
+            catch_up=saved.get("catch_up", "once"), notify=saved.get("notify", "change"),
+            threshold=saved.get("threshold"), first_run=next_run,
+            last_run=saved.get("last_run"), save=False, announce=False,
+        )
+    if saved_tasks:
+        print(f"{bcolors.OKGREEN}Restored {len(saved_tasks)} scheduled task(s){bcolors.ENDC}")
+    return saved_tasks
+
+def describe_scheduled_tasks():
+    """Returns a line per scheduled task with its last and next run times, for the system prompt."""
+    lines = []
+    with schedule_condition:
+        now_wall, now_monotonic = time.time(), time.monotonic()
+        for task in scheduled_tasks.values():
+            last_run = datetime.datetime.fromtimestamp(task["last_run"]).strftime("%Y-%m-%d %H:%M:%S") if task["last_run"] else "never"
+            next_run = datetime.datetime.fromtimestamp(now_wall + task["next_run"] - now_monotonic).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"- {task['name']}: '{task['command']}' every {task['interval']} seconds (last run: {last_run}, next run: {next_run})")
+    return "\n".join(lines) if lines else "None"
+
+def scheduled_tasks_message():
+    """Returns a system message listing the scheduled tasks as they are now, or None if there
+    are none. It is rebuilt for every chat call instead of being stored in the history, so
+    tasks removed later never linger in the prompt."""
+    if not scheduled_tasks:
+        return None
+    return {"role": "system", "content": f"Scheduled tasks (kept across restarts, no need to schedule them again):\n{describe_scheduled_tasks()}"}
+
+def record_task_result(task, result, history_size=20):
+    """Adds a run's output to the task's ring buffer and decides whether to notify about it.
+
+    "always" notifies on every run and "change" when the output differs from the previous run.
+    "above" and "below" compare the first number in the output with the task's threshold and
+    notify when the comparison starts or stops holding. Called with schedule_condition held.
+    """
+    output_hash = hashlib.sha256(result.encode()).hexdigest()
+    previous = task["results"][-1] if task["results"] else None
+    changed = previous is None or previous["hash"] != output_hash
+    if task["results"].maxlen != history_size:
+        task["results"] = deque(task["results"], maxlen=history_size)
+    task["results"].append({"time": time.time(), "hash": output_hash, "changed": changed, "output": result})
+
+    if task["notify"] == "always":
+        return True
+    if task["notify"] == "change":
+        return changed
+    match = re.search(r'-?\d+(?:\.\d+)?', result)
+    if match is None or task["threshold"] is None:
+        return changed
+    value = float(match.group())
+    alert = value > task["threshold"] if task["notify"] == "above" else value < task["threshold"]
+    crossed = alert != task["alert"]
+    task["alert"] = alert
+    return crossed
+
+def get_task_results(task_name=None, limit=5, max_output=2000):
+    """Returns recent results of scheduled tasks as JSON, without running anything.
+
+    With task_name, lists that task's last limit results (newest first); otherwise summarizes
+    every task with its latest output.
+    """
+    def describe(entry):
+        return {
+            "time": datetime.datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "changed": entry["changed"],
+            "output": truncate_text(entry["output"], max_output // 4),
+        }
 
-    schedule.every(interval).seconds.do(job)
-    scheduled_tasks[task_name] = job
-    print(f"{bcolors.OKGREEN}Task '{task_name}' scheduled to run every {interval} seconds{bcolors.ENDC}")
+    with schedule_condition:
+        if task_name is not None:
+            task = scheduled_tasks.get(task_name)
+            if task is None:
+                return json.dumps({"error": f"No task named '{task_name}' found in the schedule"})
+            return json.dumps({
+                "task": task_name,
+                "command": task["command"],
+                "notify": task["notify"],
+                "runs_recorded": len(task["results"]),
+                "results": [describe(entry) for entry in list(task["results"])[::-1][:limit]],
+            }, indent=2)
+        return json.dumps([
+            {
+                "task": task["name"],
+                "command": task["command"],
+                "latest": describe(task["results"][-1]) if task["results"] else None,
+            }
+            for task in scheduled_tasks.values()
+        ], indent=2)
+
+def run_scheduled_task(task):
+    while True:
+        start = time.monotonic()
+        result = execute_linux_command(task["command"], "full", live=False)
+        duration = time.monotonic() - start
+        with schedule_condition:
+            notify = record_task_result(task, result)
+        # Unchanged results are kept in the task's ring buffer only
+        if notify:
+            print(f"{bcolors.OKGREEN}Scheduled task '{task['name']}' executed:\nCommand: {task['command']}\nResult: {result}{bcolors.ENDC}")
+            save_command_history(task["command"], result)
+        if duration > task["interval"]:
+            print(f"{bcolors.WARNING}Scheduled task '{task['name']}' took {duration:.1f}s, longer than its {task['interval']}s interval{bcolors.ENDC}")
+
+        with schedule_condition:
+            task["last_run"] = time.time()
+            task["last_duration"] = duration
+            current = scheduled_tasks.get(task["name"]) is task
+            if task["queued"] and current:
+                task["queued"] -= 1
+            else:
+                task["running"] = False
+        if current:
+            save_scheduled_tasks()
+        if not task["running"]:
+            return
+
+def schedule_task(task_name, command, interval, overlap="skip", catch_up="once", notify="change", threshold=None,
+                  first_run=None, last_run=None, save=True, announce=True):
+    """Schedules command to run every interval seconds and saves it so it survives restarts.
+
+    overlap decides what happens when a run comes due while the previous one is still
+    going: "skip" drops it, "queue" runs it as soon as the previous run finishes.
+    catch_up decides what happens to runs missed while Gaurika was not running: "once"
+    runs the task once at startup, "skip" waits for its next regular slot.
+    notify and threshold decide which results are printed and logged (see record_task_result).
+    first_run is a Unix timestamp for the first run, by default one interval from now.
+    """
+    if interval <= 0:
+        raise ValueError("interval must be a positive number of seconds")
+    if overlap not in ("skip", "queue"):
+        raise ValueError("overlap must be 'skip' or 'queue'")
+    if catch_up not in ("once", "skip"):
+        raise ValueError("catch_up must be 'once' or 'skip'")
+    if notify not in ("always", "change", "above", "below"):
+        raise ValueError("notify must be 'always', 'change', 'above' or 'below'")
+    if notify in ("above", "below") and threshold is None:
+        raise ValueError(f"notify '{notify}' needs a threshold")
+    with schedule_condition:
+        delay = interval if first_run is None else max(0, first_run - time.time())
+        task = {
+            "name": task_name,
+            "command": command,
+            "interval": interval,
+            "overlap": overlap,
+            "catch_up": catch_up,
+            "notify": notify,
+            "threshold": threshold,
+            "alert": False,
+            "results": deque(maxlen=20),
+            "next_run": time.monotonic() + delay,
+            "running": False,
+            "queued": 0,
+            "skipped": 0,
+            "last_run": last_run,
+            "last_duration": None,
+        }
+        scheduled_tasks[task_name] = task
+        heapq.heappush(schedule_queue, (task["next_run"], next(schedule_sequence), task_name))
+        schedule_condition.notify()
+    if save:
+        save_scheduled_tasks()
+    if announce:
+        print(f"{bcolors.OKGREEN}Task '{task_name}' scheduled to run every {interval} seconds{bcolors.ENDC}")
 
 def remove_scheduled_task(task_name):
-    if task_name in scheduled_tasks:
-        schedule.cancel_job(scheduled_tasks[task_name])
-        del scheduled_tasks[task_name]
+    with schedule_condition:
+        task = scheduled_tasks.pop(task_name, None)
+        schedule_condition.notify()
+    if task is not None:
+        save_scheduled_tasks()
         print(f"{bcolors.OKGREEN}Task '{task_name}' has been removed from the schedule{bcolors.ENDC}")
     else:
         print(f"{bcolors.WARNING}No task named '{task_name}' found in the schedule{bcolors.ENDC}")
 
 def main():
-    global context_history 
-    context_history = load_context_history()
+    global context_history, live_command_timeout
+    context_history = load_context_history(max_messages=500)
 
     # Load or get user preferences
     user_preferences = get_user_preferences()
     trust_mode = user_preferences["trust_mode"]
     communication_mode = user_preferences["communication"]
+    streaming = user_preferences.get("streaming", True)
+    voice_activity_detection = user_preferences.get("voice_activity_detection", False)
+    if communication_mode == "audio":
+        try:
+            voice.configure_backends(user_preferences.get("speech_to_text"), user_preferences.get("text_to_speech"),
+                                     user_preferences.get("tts_cache_mb", 50))
+        except (ValueError, TypeError) as e:
+            print(f"{bcolors.FAIL}Invalid voice backend in user_pref.json, using the defaults: {e}{bcolors.ENDC}")
+    context_budget = user_preferences.get("context_token_budget", 8000)
+    live_command_timeout = user_preferences.get("live_command_timeout", live_command_timeout)
+    configure_connection_pool(user_preferences.get("connection_pool"))
+    if user_preferences.get("warm_up", True):
+        warm_up_connections()
 
     # Get system information
     system_info = get_system_info()
 
+    # Bring back the tasks scheduled in earlier sessions
+    restore_scheduled_tasks()
+
     # Update system prompt with user preferences, trust mode, communication mode, system info, and tool descriptions
     system_message = f"""
 **Gaurika, Your Linux Companion**
@@ -616,16 +2236,21 @@ My mission is to empower you with the knowledge and tools to navigate the Linux
 2. **WebTool:** Perform a web search and retrieve relevant content.(To utilize this tool properly i will use queries such that i get returned exactly what the user had asked)
 3. **schedule_task:** Schedule a Linux command to run at regular intervals. Provide a unique task name, the command to execute, and the interval in seconds.
 4. **remove_scheduled_task:** Remove a previously scheduled task by its name.
+5. **get_system_metrics:** Get live load, memory, disk and top-process figures. I will prefer this over execute_command for quick health checks.
+6. **get_task_results:** Get the recent results of scheduled tasks without running them again.
 
 **Important Note:** I will never directly ask you for permission to execute commands or manage tasks. The code that governs my actions handles these permissions based on your chosen trust mode.
 
 Always feel free to rely on my tools. I am here to serve as your trusted Linux companion.
 
-I shall only make use of one tool at a time
+When several tool calls do not depend on each other, such as a web search and a few read-only commands, I can make them together in one response and they will run at the same time. When a call needs the result of another, I will wait for that result first.
 """
 
     if not context_history:
         context_history.append({"role": "system", "content": system_message})
+    elif context_history[0]["role"] == "system":
+        # Histories from earlier sessions get this session's prompt; the journal keeps its copy
+        context_history[0] = {"role": "system", "content": system_message}
 
     # Start scheduler thread
     scheduler_thread = threading.Thread(target=run_scheduled_tasks)
@@ -634,15 +2259,15 @@ I shall only make use of one tool at a time
 
     print(f"{bcolors.OKGREEN}Welcome, {user_preferences['name']}! I'm your Linux assistant. How can I help you today?{bcolors.ENDC}")
     if communication_mode == "audio":
-        speak(f"Welcome, {user_preferences['name']}! I'm your Linux assistant. How can I help you today?")
+        voice.speak(f"Welcome, {user_preferences['name']}! I'm your Linux assistant. How can I help you today?")
 
     while True:
         if communication_mode == "audio":
             print(f"{bcolors.BOLD}You: {bcolors.ENDC}", end="", flush=True)
-            user_input = listen()
+            user_input = voice.listen(vad=voice_activity_detection)
             if user_input is None:
                 print(f"{bcolors.WARNING}Sorry, I couldn't hear you. Could you please repeat?{bcolors.ENDC}")
-                speak("Sorry, I couldn't hear you. Could you please repeat?")
+                voice.speak("Sorry, I couldn't hear you. Could you please repeat?")
                 continue
         else:
             user_input = input(f"{bcolors.BOLD}You: {bcolors.ENDC}")
@@ -650,31 +2275,36 @@ I shall only make use of one tool at a time
         if user_input.lower() in ["exit", "quit", "bye"]:
             print(f"{bcolors.OKGREEN}Thank you for using the Linux assistant. Goodbye!{bcolors.ENDC}")
             if communication_mode == "audio":
-                speak("Thank you for using the Linux assistant. Goodbye!")
+                voice.speak("Thank you for using the Linux assistant. Goodbye!")
             break
 
         context_history.append({"role": "user", "content": user_input})
         start = time.time()
 
-        assistant_response, tool_calls = chat(context_history) 
+        started = {}
+        assistant_response, tool_calls = chat(
+            compact_context(context_history, context_budget, extra_pinned=[scheduled_tasks_message()]),
+            stream=streaming,
+            on_tool_call=lambda tool_call: start_tool_call(tool_call, trust_mode, started),
+        )
 
         assistant_response = assistant_response or ""
 
-        webtool_result = handle_tool_calls(tool_calls, trust_mode)
+        webtool_result = handle_tool_calls(tool_calls, trust_mode, started)
 
         if webtool_result:
             assistant_response = webtool_result
             print(f"{bcolors.OKBLUE}{assistant_response}{bcolors.ENDC}")
 
         if tool_calls and not webtool_result: 
-            follow_up_response, _ = chat(context_history, tool_choice="none")
+            follow_up_response, _ = chat(compact_context(context_history, context_budget, extra_pinned=[scheduled_tasks_message()]), tool_choice="none", stream=streaming)
             follow_up_response = follow_up_response or ""
             assistant_response += "\n" + follow_up_response
 
         context_history.append({"role": "assistant", "content": assistant_response})
         print(f"{bcolors.OKCYAN}Time taken: {time.time() - start:.2f} seconds{bcolors.ENDC}")
         if communication_mode == "audio":
-            speak(assistant_response)
+            voice.speak(assistant_response)
         save_context_history(context_history)
 
 if __name__ == "__main__":
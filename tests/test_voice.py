@@ -0,0 +1,89 @@
+import array
+import math
+import unittest
+
+import voice
+
+
+def tone(amplitude, frames=1):
+    """Returns frames of 30 ms audio: a sine wave at the given amplitude."""
+    samples = array.array('h', (int(amplitude * math.sin(i / 3)) for i in range(voice.FRAME_SAMPLES)))
+    return [samples.tobytes()] * frames
+
+
+def frame_count(pcm):
+    return len(pcm) // (voice.FRAME_SAMPLES * voice.SAMPLE_WIDTH)
+
+
+def feed_all(segmenter, frames):
+    segments = []
+    for frame in frames:
+        segments.extend(segmenter.feed(frame))
+    return segments
+
+
+class SpeechSegmenterTest(unittest.TestCase):
+    def test_silence_produces_no_segments(self):
+        segmenter = voice.SpeechSegmenter()
+        self.assertEqual(feed_all(segmenter, tone(50, 100)), [])
+        self.assertFalse(segmenter.heard_speech)
+        self.assertFalse(segmenter.finished)
+        self.assertEqual(segmenter.flush(), [])
+
+    def test_threshold_follows_room_noise(self):
+        segmenter = voice.SpeechSegmenter(min_threshold=10)
+        feed_all(segmenter, tone(1000, 10))
+        self.assertGreater(segmenter.threshold, 1000)
+
+    def test_utterance_ends_after_silence(self):
+        segmenter = voice.SpeechSegmenter()
+        segments = feed_all(segmenter, tone(50, 10) + tone(5000, 20) + tone(50, 30))
+        self.assertEqual(len(segments), 1)
+        pcm, overlaps_previous = segments[0]
+        self.assertFalse(overlaps_previous)
+        # Pre-roll padding, the speech itself and the silence that ended the segment
+        self.assertEqual(frame_count(pcm), 5 + 20 + 8)
+        self.assertTrue(segmenter.finished)
+
+    def test_long_speech_is_split_with_overlap(self):
+        segmenter = voice.SpeechSegmenter(max_segment_ms=900, overlap_ms=300)
+        segments = feed_all(segmenter, tone(50, 10) + tone(5000, 50))
+        self.assertEqual([overlaps for _, overlaps in segments], [False, True])
+        first, second = segments[0][0], segments[1][0]
+        overlap_bytes = 10 * voice.FRAME_SAMPLES * voice.SAMPLE_WIDTH
+        self.assertEqual(second[:overlap_bytes], first[-overlap_bytes:])
+
+        remaining = segmenter.flush()
+        self.assertEqual(len(remaining), 1)
+        self.assertTrue(remaining[0][1])
+        self.assertEqual(segmenter.flush(), [])
+
+
+class StitchTranscriptsTest(unittest.TestCase):
+    def test_joins_segments_in_order(self):
+        self.assertEqual(voice.stitch_transcripts([("one two", False), ("three", False)]), "one two three")
+
+    def test_drops_words_repeated_across_an_overlap(self):
+        parts = [("please list the files in", False), ("Files in my home folder.", True)]
+        self.assertEqual(voice.stitch_transcripts(parts), "please list the files in my home folder.")
+
+    def test_keeps_repeats_without_overlap(self):
+        parts = [("yes", False), ("yes", False)]
+        self.assertEqual(voice.stitch_transcripts(parts), "yes yes")
+
+    def test_empty_transcripts(self):
+        self.assertEqual(voice.stitch_transcripts([]), "")
+        self.assertEqual(voice.stitch_transcripts([("", False), ("hello", True)]), "hello")
+
+
+class FakeTranscriberTest(unittest.TestCase):
+    def test_returns_transcripts_in_order_and_records_calls(self):
+        transcriber = voice.FakeTranscriber(["first", "second"])
+        self.assertEqual(transcriber.transcribe(b"a"), "first")
+        self.assertEqual(transcriber.transcribe(b"b"), "second")
+        self.assertEqual(transcriber.transcribe(b"c"), "")
+        self.assertEqual(transcriber.calls, [b"a", b"b", b"c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
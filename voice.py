@@ -2,7 +2,19 @@ import requests
 import playsound
 import os
 from typing import Union
+import io
+import hashlib
 import threading
+import shutil
+import tempfile
+import subprocess
+import re
+import math
+import time
+import array
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pyaudio
 import wave
 from groq import Groq
@@ -14,117 +26,539 @@ load_dotenv()
 # Suppress ALSA warnings using logging
 logging.getLogger('alsaaudio').setLevel(logging.CRITICAL)
 
-def listen():
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-    # Audio recording parameters
-    CHUNK = 4096  # Increased chunk size for faster processing
-    FORMAT = pyaudio.paInt16
-    CHANNELS = 1
-    RATE = 44100
-
-    recording = False
-    frames = []
-    transcription_text = ""
-
-    def record_audio():
-        nonlocal frames
-        p = pyaudio.PyAudio()
-        stream = p.open(format=FORMAT,
-                        channels=CHANNELS,
-                        rate=RATE,
-                        input=True,
-                        frames_per_buffer=CHUNK)
-
-        frames = []
-        while recording:
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Save the recorded audio to a file
-        filename = "recorded_audio.wav"
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(p.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b''.join(frames))
-
-        return filename
-
-    def transcribe_audio(filename):
-        nonlocal transcription_text
-        with open(filename, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(filename, file),
-                model="whisper-large-v3",
-                prompt="Specify context or spelling",
-                response_format="json",
-                language="en",
-                temperature=0.0
-            )
-        print("Transcription:", transcription.text.strip())
-
-        # Clean up the temporary audio file
-        os.remove(filename)
-        transcription_text = transcription.text.strip()
-        return transcription_text
-
-    def wait_for_input():
-        nonlocal recording
-        input("Press Enter to start recording...")
-        recording = True
-        print("Recording started. Press Enter again to stop...")
-        input()
-        recording = False
-        print("Recording stopped. Transcribing...")
-
-    # Start input thread
-    input_thread = threading.Thread(target=wait_for_input)
-    input_thread.start()
-
-    while True:
-        if recording:
-            # Start recording in a separate thread
-            record_thread = threading.Thread(target=record_audio)
-            record_thread.start()
-
-            # Wait for the recording to finish
-            input_thread.join()
-            record_thread.join()
-
-            # Transcribe the audio
-            audio_file = "recorded_audio.wav"
-            if os.path.exists(audio_file):
-                transcribe_audio(audio_file)
-            else:
-                print("No audio recorded.")
-            break
-
-    return transcription_text
+# Audio recording parameters: 16 kHz mono is what Whisper works at, so nothing is lost
+# compared to recording at 44.1 kHz and the upload is a third of the size
+RATE = 16000
+CHANNELS = 1
+FORMAT = pyaudio.paInt16
+SAMPLE_WIDTH = 2
+CHUNK = 1024
+MAX_SECONDS = 120
+
+groq_client = None
+
+def get_groq_client():
+    global groq_client
+    if groq_client is None:
+        groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return groq_client
+
+def record_audio(max_seconds=MAX_SECONDS):
+    """Records from the microphone between two presses of Enter.
+
+    Samples are written by PyAudio's callback thread straight into a preallocated buffer
+    while the calling thread blocks on input(), and recording stops early once the buffer
+    holds max_seconds of audio. Returns the raw 16-bit PCM bytes.
+    """
+    buffer = bytearray(max_seconds * RATE * CHANNELS * SAMPLE_WIDTH)
+    view = memoryview(buffer)
+    length = 0
+
+    def callback(in_data, frame_count, time_info, status):
+        nonlocal length
+        size = min(len(in_data), len(buffer) - length)
+        view[length:length + size] = in_data[:size]
+        length += size
+        return (None, pyaudio.paComplete if length == len(buffer) else pyaudio.paContinue)
+
+    input("Press Enter to start recording...")
+    p = pyaudio.PyAudio()
+    stream = p.open(format=FORMAT,
+                    channels=CHANNELS,
+                    rate=RATE,
+                    input=True,
+                    frames_per_buffer=CHUNK,
+                    stream_callback=callback)
+    print("Recording started. Press Enter again to stop...")
+    input()
+    stream.stop_stream()
+    stream.close()
+    p.terminate()
+    print("Recording stopped. Transcribing...")
+    return bytes(view[:length])
+
+def encode_wav(pcm, rate=RATE):
+    """Wraps raw PCM in a WAV container in memory."""
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return output.getvalue()
+
+def transcribe_audio(wav_bytes, model="whisper-large-v3", language="en"):
+    transcription = get_groq_client().audio.transcriptions.create(
+        file=("recorded_audio.wav", wav_bytes),
+        model=model,
+        prompt="Specify context or spelling",
+        response_format="json",
+        language=language,
+        temperature=0.0
+    )
+    return transcription.text.strip()
+
+# Speech-to-text backends: anything with a transcribe(wav_bytes) -> str method
+class GroqTranscriber:
+    """Transcribes with Whisper hosted on Groq, reusing one client for every utterance."""
+
+    def __init__(self, model="whisper-large-v3", language="en"):
+        self.model = model
+        self.language = language
+
+    def transcribe(self, wav_bytes):
+        return transcribe_audio(wav_bytes, self.model, self.language)
+
+class WhisperCppTranscriber:
+    """Transcribes locally with the whisper.cpp command line tool, with no network round-trip."""
+
+    def __init__(self, model, binary="whisper-cli", language="en", threads=None):
+        self.model = os.path.expanduser(model)
+        self.binary = binary
+        self.language = language
+        self.threads = threads
+
+    def transcribe(self, wav_bytes):
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as file:
+            file.write(wav_bytes)
+        try:
+            command = [self.binary, "-m", self.model, "-f", file.name, "-l", self.language, "-nt", "-np"]
+            if self.threads:
+                command += ["-t", str(self.threads)]
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        finally:
+            os.remove(file.name)
+        return " ".join(result.stdout.split())
+
+class FakeTranscriber:
+    """Local stand-in backend for tests: returns the given transcripts in order, one per call."""
+
+    def __init__(self, transcripts=(), delay=0.0):
+        self.transcripts = deque(transcripts)
+        self.delay = delay
+        self.calls = []
+
+    def transcribe(self, wav_bytes):
+        self.calls.append(wav_bytes)
+        if self.delay:
+            time.sleep(self.delay)
+        return self.transcripts.popleft() if self.transcripts else ""
+
+# Voice activity detection works on 30 ms frames
+FRAME_MS = 30
+FRAME_SAMPLES = RATE * FRAME_MS // 1000
+
+def frame_rms(frame):
+    samples = array.array('h', frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+class SpeechSegmenter:
+    """Cuts a stream of 30 ms PCM frames into speech segments by frame energy.
+
+    The first calibration_ms of audio sets the threshold from the room's noise level. A
+    segment ends after segment_silence_ms of quiet, and the utterance is finished after
+    end_silence_ms. Segments that run past max_segment_ms are cut, and the next segment
+    starts with the last overlap_ms of audio so no word is lost at the cut.
+    """
+
+    def __init__(self, min_threshold=300, segment_silence_ms=250, end_silence_ms=700,
+                 max_segment_ms=8000, overlap_ms=500, padding_ms=150, calibration_ms=300):
+        self.min_threshold = min_threshold
+        self.threshold = min_threshold
+        self.segment_silence_frames = segment_silence_ms // FRAME_MS
+        self.end_silence_frames = end_silence_ms // FRAME_MS
+        self.max_segment_frames = max_segment_ms // FRAME_MS
+        self.overlap_frames = overlap_ms // FRAME_MS
+        self.calibration_frames = calibration_ms // FRAME_MS
+        self.noise_levels = []
+        self.pre_roll = deque(maxlen=max(1, padding_ms // FRAME_MS))
+        self.current = []
+        self.current_overlaps = False
+        self.silence_frames = 0
+        self.heard_speech = False
+        self.finished = False
+
+    def feed(self, frame):
+        """Consumes one frame and returns the segments it completed as (pcm, overlaps_previous) pairs."""
+        level = frame_rms(frame)
+        if len(self.noise_levels) < self.calibration_frames:
+            self.noise_levels.append(level)
+            if len(self.noise_levels) == self.calibration_frames:
+                self.threshold = max(self.min_threshold, 3 * sum(self.noise_levels) / len(self.noise_levels))
+            self.pre_roll.append(frame)
+            return []
+
+        segments = []
+        if level >= self.threshold:
+            if not self.current:
+                self.current = list(self.pre_roll)
+            self.current.append(frame)
+            self.silence_frames = 0
+            self.heard_speech = True
+            if len(self.current) >= self.max_segment_frames:
+                segments.append((b"".join(self.current), self.current_overlaps))
+                self.current = self.current[-self.overlap_frames:] if self.overlap_frames else []
+                self.current_overlaps = bool(self.current)
+        else:
+            self.silence_frames += 1
+            if self.current:
+                self.current.append(frame)
+                if self.silence_frames >= self.segment_silence_frames:
+                    segments.append((b"".join(self.current), self.current_overlaps))
+                    self.current = []
+                    self.current_overlaps = False
+            if self.heard_speech and self.silence_frames >= self.end_silence_frames:
+                self.finished = True
+        self.pre_roll.append(frame)
+        return segments
+
+    def flush(self):
+        """Returns whatever speech is still buffered as a final segment."""
+        segments = [(b"".join(self.current), self.current_overlaps)] if self.current else []
+        self.current = []
+        return segments
+
+def stitch_transcripts(parts, max_overlap_words=8):
+    """Joins (text, overlaps_previous) transcripts in order.
+
+    Where a segment started with audio repeated from the previous one, the words both
+    transcripts share at the seam are only kept once.
+    """
+    def normalize(word):
+        return re.sub(r'\W', '', word.lower())
+
+    words = []
+    for text, overlaps_previous in parts:
+        new_words = text.split()
+        skip = 0
+        if overlaps_previous:
+            for size in range(min(max_overlap_words, len(words), len(new_words)), 0, -1):
+                if [normalize(w) for w in words[-size:]] == [normalize(w) for w in new_words[:size]]:
+                    skip = size
+                    break
+        words.extend(new_words[skip:])
+    return " ".join(words)
+
+def listen_with_vad(transcriber, max_seconds=MAX_SECONDS, wait_seconds=None):
+    """Listens until the user stops speaking, transcribing each speech segment as soon as it ends.
+
+    Segments are transcribed in the background while the user keeps talking, so once they
+    stop only the last segment is still in flight. By default it waits as long as it takes
+    for someone to speak; with wait_seconds set it returns None if nobody speaks in time.
+    An utterance is cut off after max_seconds.
+    """
+    frames = queue.Queue()
+
+    def callback(in_data, frame_count, time_info, status):
+        frames.put(in_data)
+        return (None, pyaudio.paContinue)
+
+    p = pyaudio.PyAudio()
+    stream = p.open(format=FORMAT,
+                    channels=CHANNELS,
+                    rate=RATE,
+                    input=True,
+                    frames_per_buffer=FRAME_SAMPLES,
+                    stream_callback=callback)
+    print("Listening... start speaking whenever you are ready.")
+
+    segmenter = SpeechSegmenter()
+    pending = []
+    start = time.monotonic()
+    speech_start = None
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        try:
+            while not segmenter.finished:
+                now = time.monotonic()
+                if speech_start is None and segmenter.heard_speech:
+                    speech_start = now
+                if speech_start is not None and now - speech_start > max_seconds:
+                    break
+                if speech_start is None and wait_seconds is not None and now - start > wait_seconds:
+                    break
+                try:
+                    frame = frames.get(timeout=1)
+                except queue.Empty:
+                    continue
+                for pcm, overlaps_previous in segmenter.feed(frame):
+                    pending.append((executor.submit(transcriber.transcribe, encode_wav(pcm)), overlaps_previous))
+        finally:
+            stream.stop_stream()
+            stream.close()
+            p.terminate()
+        for pcm, overlaps_previous in segmenter.flush():
+            pending.append((executor.submit(transcriber.transcribe, encode_wav(pcm)), overlaps_previous))
+        parts = [(future.result(), overlaps_previous) for future, overlaps_previous in pending]
+
+    if not segmenter.heard_speech:
+        return None
+    return stitch_transcripts(parts)
+
+def listen(vad=False, transcriber=None):
+    """Records one utterance and returns its transcription, or None if nothing was heard.
+
+    By default recording runs between two presses of Enter. With vad set, speech is
+    detected automatically and transcribed segment by segment as the user talks.
+    """
+    transcriber = transcriber or speech_to_text
+    if vad:
+        text = listen_with_vad(transcriber)
+    else:
+        pcm = record_audio()
+        if not pcm:
+            print("No audio recorded.")
+            return None
+        text = transcriber.transcribe(encode_wav(pcm))
+    if text:
+        print("Transcription:", text)
+    return text or None
+
+tts_session = None
+
+def get_tts_session():
+    global tts_session
+    if tts_session is None:
+        tts_session = requests.Session()
+        tts_session.headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+    return tts_session
 
 def generate_audio(message: str, voice: str = "Salli"):
-    url = f"https://api.streamelements.com/kappa/v2/speech?voice={voice}&text={{{message}}}"
-    headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'}
     try:
-        return requests.get(url=url, headers=headers).content
+        response = get_tts_session().get("https://api.streamelements.com/kappa/v2/speech",
+                                         params={"voice": voice, "text": message}, timeout=30)
+        response.raise_for_status()
+        return response.content
     except Exception as e:
         print(f"Error generating audio: {e}")
         return None
 
-def speak(message: str, folder: str = "", extension: str = ".mp3") -> Union[None, str]:
+# Text-to-speech backends: anything with a synthesize(text) -> bytes method, plus the
+# voice it speaks with and the extension of the audio it returns
+class StreamElementsSynthesizer:
+    """Synthesizes with the StreamElements speech endpoint over a persistent session."""
+
+    extension = ".mp3"
+
+    def __init__(self, voice="Salli"):
+        self.voice = voice
+
+    def synthesize(self, text):
+        return generate_audio(text, self.voice)
+
+class PiperSynthesizer:
+    """Synthesizes locally with the Piper command line tool."""
+
+    extension = ".wav"
+
+    def __init__(self, model, binary="piper", speaker=None):
+        self.model = os.path.expanduser(model)
+        self.binary = binary
+        self.speaker = speaker
+        self.voice = os.path.splitext(os.path.basename(self.model))[0] + ("" if speaker is None else f"#{speaker}")
+
+    def synthesize(self, text):
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as file:
+            pass
+        try:
+            command = [self.binary, "--model", self.model, "--output_file", file.name]
+            if self.speaker is not None:
+                command += ["--speaker", str(self.speaker)]
+            subprocess.run(command, input=text, capture_output=True, text=True, check=True)
+            with open(file.name, "rb") as output:
+                return output.read()
+        finally:
+            os.remove(file.name)
+
+class FakeSynthesizer:
+    """Local stand-in backend for tests: returns a short silent clip per call and records the text."""
+
+    extension = ".wav"
+    voice = "fake"
+
+    def __init__(self, seconds=0.1, delay=0.0):
+        self.seconds = seconds
+        self.delay = delay
+        self.calls = []
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        if self.delay:
+            time.sleep(self.delay)
+        return encode_wav(bytes(int(RATE * self.seconds) * SAMPLE_WIDTH))
+
+class CachedSynthesizer:
+    """Wraps a text-to-speech backend with a content-addressed on-disk audio cache.
+
+    Clips are stored as one file per sha256(backend, voice, text), so repeated phrases such
+    as greetings play without a network request. A hit refreshes the file's mtime, and once
+    the folder grows past max_bytes the least recently used clips are deleted.
+    """
+
+    def __init__(self, synthesizer, folder="tts_cache", max_bytes=50 * 1024 * 1024):
+        self.synthesizer = synthesizer
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    @property
+    def voice(self):
+        return self.synthesizer.voice
+
+    @property
+    def extension(self):
+        return self.synthesizer.extension
+
+    def path_for(self, text):
+        key = "\0".join([type(self.synthesizer).__name__, str(self.voice), " ".join(text.split())])
+        return os.path.join(self.folder, hashlib.sha256(key.encode("utf-8")).hexdigest() + self.extension)
+
+    def synthesize(self, text):
+        path = self.path_for(text)
+        try:
+            with open(path, "rb") as file:
+                audio = file.read()
+            os.utime(path)
+            return audio
+        except OSError:
+            pass
+        audio = self.synthesizer.synthesize(text)
+        if audio:
+            try:
+                self.store(path, audio)
+            except OSError as e:
+                print(f"Error caching audio: {e}")
+        return audio
+
+    def store(self, path, audio):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(audio)
+        os.replace(temp_path, path)
+        with self.lock:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def split_sentences(message, max_chars=250):
+    """Splits text into sentences for synthesis, breaking any sentence longer than
+    max_chars at word boundaries so every request stays well under URL length limits."""
+    chunks = []
+    for sentence in re.split(r'(?<=[.!?;:])\s+|\n+', message):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if re.search(r'\w', sentence):
+            chunks.append(sentence)
+    return chunks
+
+# Players that can read audio from stdin, so it never has to touch the disk
+stdin_players = {
+    ".mp3": [
+        ["mpg123", "-q", "-"],
+        ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "-"],
+        ["mpv", "--no-video", "--really-quiet", "-"],
+    ],
+    ".wav": [
+        ["aplay", "-q", "-"],
+        ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "-"],
+        ["mpv", "--no-video", "--really-quiet", "-"],
+    ],
+}
+
+def play_audio(audio: bytes, extension: str = ".mp3"):
+    for player in stdin_players.get(extension, []):
+        if shutil.which(player[0]):
+            subprocess.run(player, input=audio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+    # playsound only plays files, so fall back to a short-lived temporary one
+    with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as file:
+        file.write(audio)
     try:
-        result_content = generate_audio(message)
-        if result_content:
-            file_path = os.path.join(folder, f"Audio{extension}")
-            with open(file_path, "wb") as file:
-                file.write(result_content)
-            playsound.playsound(file_path)
-            os.remove(file_path)
+        playsound.playsound(file.name)
+    finally:
+        os.remove(file.name)
+
+tts_executor = ThreadPoolExecutor(max_workers=3)
+
+def speak(message: str, extension: str = None, lookahead: int = 3, synthesizer=None) -> Union[None, str]:
+    """Speaks a message sentence by sentence.
+
+    Up to lookahead sentences are synthesized ahead of the one playing, so playback starts
+    as soon as the first sentence is ready instead of after the whole response.
+    """
+    synthesizer = synthesizer or text_to_speech
+    extension = extension or synthesizer.extension
+    try:
+        sentences = iter(split_sentences(message))
+        pending = deque()
+        for sentence in sentences:
+            pending.append(tts_executor.submit(synthesizer.synthesize, sentence))
+            if len(pending) >= lookahead:
+                break
+        while pending:
+            audio = pending.popleft().result()
+            next_sentence = next(sentences, None)
+            if next_sentence is not None:
+                pending.append(tts_executor.submit(synthesizer.synthesize, next_sentence))
+            if audio:
+                play_audio(audio, extension)
         return None
     except Exception as e:
         return f"Error playing TTS: {str(e)}"
-    
\ No newline at end of file
+
+speech_to_text_backends = {
+    "groq": GroqTranscriber,
+    "whisper.cpp": WhisperCppTranscriber,
+    "fake": FakeTranscriber,
+}
+
+text_to_speech_backends = {
+    "streamelements": StreamElementsSynthesizer,
+    "piper": PiperSynthesizer,
+    "fake": FakeSynthesizer,
+}
+
+speech_to_text = GroqTranscriber()
+text_to_speech = CachedSynthesizer(StreamElementsSynthesizer())
+
+def create_backend(backends, spec):
+    """Builds a backend from a user_pref.json entry: either a backend name, or an object
+    with a "backend" name and the options to construct it with."""
+    options = dict(spec) if isinstance(spec, dict) else {"backend": spec}
+    name = options.pop("backend", None)
+    if name not in backends:
+        raise ValueError(f"Unknown voice backend {name!r}, expected one of: {', '.join(backends)}")
+    return backends[name](**options)
+
+def configure_backends(stt=None, tts=None, tts_cache_mb=50):
+    """Selects the speech-to-text and text-to-speech backends used by listen and speak.
+    Backends that are not given keep their current setting. Synthesized audio is cached
+    up to tts_cache_mb megabytes, or not at all if it is 0."""
+    global speech_to_text, text_to_speech
+    if stt:
+        speech_to_text = create_backend(speech_to_text_backends, stt)
+    synthesizer = create_backend(text_to_speech_backends, tts) if tts else text_to_speech
+    if isinstance(synthesizer, CachedSynthesizer):
+        synthesizer = synthesizer.synthesizer
+    text_to_speech = CachedSynthesizer(synthesizer, max_bytes=tts_cache_mb * 1024 * 1024) if tts_cache_mb else synthesizer